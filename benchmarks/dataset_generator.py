@@ -0,0 +1,98 @@
+import argparse
+import json
+import random
+from datetime import date, datetime, timedelta
+
+def generate_habit_dates(rng, habit_type, start, end, completion_rate=0.8, gap_rate=0.02, max_gap_days=21):
+    """
+    Generate the completion dates of a single habit.
+
+    Daily habits are completed on each day with probability completion_rate, weekly habits on one random day of each week.
+    With probability gap_rate per day a break of up to max_gap_days without any completion starts.
+
+    :param rng: The random.Random instance to draw from.
+    :param habit_type: 'daily' or 'weekly'.
+    :param start: First date (datetime.date) of the history.
+    :param end: Last date (datetime.date) of the history.
+    :param completion_rate: Probability of completing the habit on a given day (daily) or week (weekly).
+    :param gap_rate: Probability per day of starting a break.
+    :param max_gap_days: Longest break in days.
+    :return: A sorted list of 'YYYY-MM-DD' strings.
+    """
+    dates = []
+    ordinal, last = start.toordinal(), end.toordinal()
+    while ordinal <= last:
+        if rng.random() < gap_rate:
+            ordinal += rng.randint(1, max_gap_days)
+            continue
+        if habit_type == 'daily':
+            if rng.random() < completion_rate:
+                dates.append(date.fromordinal(ordinal).isoformat())
+            ordinal += 1
+        else:
+            day = ordinal + rng.randrange(7)
+            if day <= last and rng.random() < completion_rate:
+                dates.append(date.fromordinal(day).isoformat())
+            ordinal += 7
+    return dates
+
+def generate_dataset(num_habits, years, weekly_ratio=0.3, completion_rate=0.8, gap_rate=0.02, seed=0, end=None):
+    """
+    Generate a synthetic dataset in the same JSON schema as data/sample_habits.json.
+
+    The same arguments and seed always give the same dataset.
+
+    :param num_habits: Number of habits to generate.
+    :param years: Length of the history in years.
+    :param weekly_ratio: Share of weekly habits, the rest are daily.
+    :param completion_rate: Probability of completing a habit on a given day (daily) or week (weekly).
+    :param gap_rate: Probability per day of starting a break.
+    :param seed: Seed of the random generator.
+    :param end: Last date (datetime.date) of the history, defaults to today.
+    :return: A dictionary mapping habit names to {'type': ..., 'completion_dates': [...]}.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.today().date()
+    start = end - timedelta(days=int(365.25 * years))
+    data = {}
+    for index in range(num_habits):
+        habit_type = 'weekly' if rng.random() < weekly_ratio else 'daily'
+        # Habits start at different times so histories have different lengths
+        habit_start = start + timedelta(days=rng.randrange(max(1, (end - start).days // 4)))
+        data[f"habit {index:06d}"] = {
+            'type': habit_type,
+            'completion_dates': generate_habit_dates(rng, habit_type, habit_start, end, completion_rate, gap_rate),
+        }
+    return data
+
+def write_dataset(json_file_path, **options):
+    """
+    Generate a dataset and write it to a JSON file with the same formatting as HabitTracker.
+
+    :param json_file_path: Destination path.
+    :param options: Keyword arguments for generate_dataset.
+    :return: The total number of completion dates written.
+    """
+    data = generate_dataset(**options)
+    with open(json_file_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    return sum(len(info['completion_dates']) for info in data.values())
+
+def main(argv=None):
+    """Command line entry point: python -m benchmarks.dataset_generator out.json --habits 1000 --years 5"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic habit dataset.")
+    parser.add_argument('output', help="Path of the JSON file to write.")
+    parser.add_argument('--habits', type=int, default=1000, help="Number of habits.")
+    parser.add_argument('--years', type=float, default=5, help="Years of history.")
+    parser.add_argument('--weekly-ratio', type=float, default=0.3, help="Share of weekly habits.")
+    parser.add_argument('--completion-rate', type=float, default=0.8, help="Probability of completing a habit per day/week.")
+    parser.add_argument('--gap-rate', type=float, default=0.02, help="Probability per day of starting a break.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random generator.")
+    args = parser.parse_args(argv)
+
+    count = write_dataset(args.output, num_habits=args.habits, years=args.years, weekly_ratio=args.weekly_ratio,
+                          completion_rate=args.completion_rate, gap_rate=args.gap_rate, seed=args.seed)
+    print(f"Wrote {args.habits} habits with {count} completion dates to '{args.output}'.")
+
+if __name__ == '__main__':
+    main()
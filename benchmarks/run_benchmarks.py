@@ -0,0 +1,153 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from benchmarks.dataset_generator import write_dataset
+from habit_classes.habit_tracker import HabitTracker
+
+def measure(operation, repeats, setup=None):
+    """
+    Time an operation and measure its peak memory.
+
+    The timed runs are done without tracemalloc, which would slow them down; one extra run is traced for the peak.
+
+    :param operation: The function to measure. It is called repeats + 1 times.
+    :param repeats: Number of timed runs.
+    :param setup: Optional function run, untimed, before each call; its result is passed to operation.
+    :return: A dictionary with the best and mean time in seconds and the traced peak in bytes.
+    """
+    timings = []
+    arguments = ()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeats):
+            if setup is not None:
+                arguments = (setup(),)
+            start = time.perf_counter()
+            operation(*arguments)
+            timings.append(time.perf_counter() - start)
+        if setup is not None:
+            arguments = (setup(),)
+        tracemalloc.start()
+        try:
+            operation(*arguments)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'best_seconds': min(timings), 'mean_seconds': sum(timings) / len(timings),
+            'repeats': repeats, 'peak_bytes': peak}
+
+def run_benchmarks(json_file_path, repeats=3, updates=5, seed=0):
+    """
+    Time the main HabitTracker operations against a data file.
+
+    :param json_file_path: Path of the dataset. It is modified by the mutating operations.
+    :param repeats: Number of timed runs per operation.
+    :param updates: Number of update_habit_custom_date calls per run.
+    :param seed: Seed used to pick the habits and dates to update.
+    :return: A dictionary mapping operation names to their measurements.
+    """
+    rng = random.Random(seed)
+    tracker = HabitTracker(json_file_path)
+    names = list(tracker.habits)
+    today = datetime.today().date()
+
+    def update_some_habits():
+        for _ in range(updates):
+            day = today - timedelta(days=rng.randrange(1, 365))
+            tracker.update_habit_custom_date(rng.choice(names), day.strftime('%Y-%m-%d'))
+
+    def verify_all_streaks():
+        for habit in tracker.habits.values():
+            habit.verify_streak()
+
+    operations = {
+        'load_habits': lambda: HabitTracker(json_file_path),
+        'save_habits': tracker.save_habits,
+        'update_habit_custom_date': update_some_habits,
+        'verify_streak': verify_all_streaks,
+        'longest_habit_streak': tracker.longest_habit_streak,
+        'habits_most_struggled_last_month': tracker.habits_most_struggled_last_month,
+    }
+    results = {name: measure(operation, repeats) for name, operation in operations.items()}
+    # Backfilling changes the tracker, so each run gets a freshly loaded one
+    results['fill_missing_dates'] = measure(HabitTracker.fill_missing_dates, repeats,
+                                            setup=lambda: HabitTracker(json_file_path))
+    return results
+
+def compare_reports(report, baseline, threshold=1.2):
+    """
+    Compare a report with a baseline report.
+
+    :param report: The current report.
+    :param baseline: The baseline report.
+    :param threshold: Ratio of current to baseline best time above which an operation counts as a regression.
+    :return: A tuple (list of printable lines, list of regressed operation names).
+    """
+    lines = [f"{'operation':<34}{'baseline s':>12}{'current s':>12}{'ratio':>8}"]
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            lines.append(f"{name:<34}{'-':>12}{current['best_seconds']:>12.4f}{'-':>8}")
+            continue
+        ratio = current['best_seconds'] / previous['best_seconds'] if previous['best_seconds'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        lines.append(f"{name:<34}{previous['best_seconds']:>12.4f}{current['best_seconds']:>12.4f}{ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return lines, regressions
+
+def main(argv=None):
+    """Command line entry point: python -m benchmarks.run_benchmarks --habits 1000 --years 5 --output report.json"""
+    parser = argparse.ArgumentParser(description="Benchmark HabitTracker on a synthetic dataset.")
+    parser.add_argument('--habits', type=int, default=1000, help="Number of habits in the dataset.")
+    parser.add_argument('--years', type=float, default=5, help="Years of history in the dataset.")
+    parser.add_argument('--weekly-ratio', type=float, default=0.3, help="Share of weekly habits.")
+    parser.add_argument('--gap-days', type=int, default=30, help="Days between the end of the history and today, for fill_missing_dates.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the dataset and of the updates.")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per operation.")
+    parser.add_argument('--updates', type=int, default=5, help="update_habit_custom_date calls per run.")
+    parser.add_argument('--output', help="Path of the JSON report to write.")
+    parser.add_argument('--baseline', help="JSON report to compare against.")
+    parser.add_argument('--threshold', type=float, default=1.2, help="Slowdown ratio reported as a regression.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file_path = os.path.join(directory, 'benchmark_habits.json')
+        end = datetime.today().date() - timedelta(days=args.gap_days)
+        dates = write_dataset(json_file_path, num_habits=args.habits, years=args.years,
+                              weekly_ratio=args.weekly_ratio, seed=args.seed, end=end)
+        file_size = os.path.getsize(json_file_path)
+        results = run_benchmarks(json_file_path, args.repeats, args.updates, args.seed)
+
+    report = {
+        'meta': {
+            'habits': args.habits, 'years': args.years, 'weekly_ratio': args.weekly_ratio, 'gap_days': args.gap_days,
+            'seed': args.seed, 'completion_dates': dates, 'file_bytes': file_size,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    for name, result in results.items():
+        print(f"{name:<34}{result['best_seconds']:>10.4f} s{result['peak_bytes'] / 1024:>12.0f} KiB peak")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressions = compare_reports(report, baseline, args.threshold)
+        print('\n'.join(lines))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
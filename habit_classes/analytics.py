@@ -0,0 +1,249 @@
+import calendar
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from habit_classes.habit import Habit
+from habit_classes.rollups import month_opportunities, month_weeks, struggle_score
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, HabitAnalytics falls back to pure Python without it
+    np = None
+
+# Day ordinal of 1970-01-01, used to turn day ordinals into numpy datetime64 days
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class HabitAnalytics:
+    """
+    Answers streak and struggle queries for all habits at once.
+
+    With NumPy available, every habit's sorted day ordinals are packed into one contiguous array with an offsets table
+    (a ragged array), and each query is a handful of vectorized passes (diff, cumulative max, reduceat, bincount)
+    over that array. Without NumPy the same queries are answered habit by habit from each Habit's cached state.
+
+    The packed arrays are a snapshot: build a new HabitAnalytics after the habits change.
+    """
+
+    def __init__(self, habits, use_numpy=None, snapshot=None):
+        """
+        Pack the habits for analysis.
+
+        :param habits: A dictionary mapping habit names to Habit objects.
+        :param use_numpy: Force the NumPy (True) or pure-Python (False) path. Defaults to NumPy when it is installed.
+        :param snapshot: Optional BinarySnapshot holding exactly these habits, in the same order, to pack from.
+        """
+        if use_numpy and np is None:
+            raise ImportError("NumPy is required for the vectorized analytics.")
+        self.habits = habits
+        self.names = list(habits)
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        if self.use_numpy:
+            self._pack(snapshot)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, use_numpy=None):
+        """
+        Analyse a memory-mapped binary snapshot. With NumPy the packed ordinals are the mapped file itself, so no
+        date is parsed or copied; without it each habit is loaded from the mapping on first use.
+
+        :param snapshot: An open BinarySnapshot. Keep it open while the analytics are in use.
+        :param use_numpy: See __init__.
+        :return: A HabitAnalytics instance.
+        """
+        habits = {name: Habit.lazy(name, habit_type, lambda name=name: snapshot.habit_ordinals(name))
+                  for name, habit_type in zip(snapshot.names, snapshot.types)}
+        return cls(habits, use_numpy, snapshot)
+
+    def _pack(self, snapshot=None):
+        """Build the ragged array of ordinals, the per-element habit ids and the per-habit type masks."""
+        habits = [self.habits[name] for name in self.names]
+        if snapshot is not None:
+            self.offsets = np.frombuffer(snapshot.offsets, dtype=np.uint64).astype(np.int64)
+            lengths = np.diff(self.offsets)
+            # A zero-copy view of the mapped file; int32 is wide enough for every day ordinal
+            self.ordinals = np.frombuffer(snapshot.ordinals, dtype=np.intc)
+        else:
+            lengths = np.fromiter((len(habit.ordinals) for habit in habits), dtype=np.int64, count=len(habits))
+            self.offsets = np.zeros(len(habits) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=self.offsets[1:])
+            if habits:
+                self.ordinals = np.concatenate([np.frombuffer(habit.ordinals, dtype=np.intc) for habit in habits]).astype(np.int64)
+            else:
+                self.ordinals = np.zeros(0, dtype=np.int64)
+        self.habit_ids = np.repeat(np.arange(len(habits)), lengths)
+        self.is_weekly = np.array([habit.habit_type == 'weekly' for habit in habits], dtype=bool)
+        self.is_tracked = np.array([habit.habit_type in ('daily', 'weekly') for habit in habits], dtype=bool)
+        # Streak units: day ordinals for daily habits, Monday-based week numbers for weekly ones
+        self.units = np.where(self.is_weekly[self.habit_ids], (self.ordinals - 1) // 7, self.ordinals)
+        self._run_cache = None
+
+    def _runs(self):
+        """
+        Split the units into runs of consecutive units. The result is computed once per snapshot.
+
+        :return: A tuple (habit ids, units, run length ending at each element, index of each habit's first element),
+                 with repeated units (several completions in the same week) collapsed.
+        """
+        if self._run_cache is not None:
+            return self._run_cache
+        ids, units = self.habit_ids, self.units
+        if not len(units):
+            empty = np.zeros(0, dtype=np.int64)
+            self._run_cache = empty, empty, empty, empty
+            return self._run_cache
+        new_habit = np.empty(len(units), dtype=bool)
+        new_habit[0] = True
+        np.not_equal(ids[1:], ids[:-1], out=new_habit[1:])
+        # Several completions in the same week count as one unit
+        distinct = new_habit.copy()
+        distinct[1:] |= units[1:] != units[:-1]
+        ids, units, new_habit = ids[distinct], units[distinct], new_habit[distinct]
+        run_start = new_habit.copy()
+        run_start[1:] |= np.diff(units) != 1
+        positions = np.arange(len(units))
+        run_length = positions - np.maximum.accumulate(np.where(run_start, positions, 0)) + 1
+        self._run_cache = ids, units, run_length, np.flatnonzero(new_habit)
+        return self._run_cache
+
+    def longest_streaks(self):
+        """
+        :return: A dictionary mapping each habit name to its longest run of consecutive days or weeks.
+        """
+        if not self.use_numpy:
+            return {name: habit.longest_streak() for name, habit in self.habits.items()}
+        ids, units, run_length, habit_starts = self._runs()
+        longest = np.zeros(len(self.names), dtype=np.int64)
+        if len(habit_starts):
+            longest[ids[habit_starts]] = np.maximum.reduceat(run_length, habit_starts)
+        return dict(zip(self.names, longest.tolist()))
+
+    def current_streaks(self, today=None):
+        """
+        Compute every habit's current streak, with the same rules as Habit.verify_streak.
+
+        :param today: The reference date (datetime.date), defaults to today.
+        :return: A dictionary mapping each habit name to its current streak.
+        """
+        if today is None:
+            today = datetime.today().date()
+        if not self.use_numpy:
+            return {name: habit.current_streak(today) for name, habit in self.habits.items()}
+        today_ordinal = today.toordinal()
+        today_units = np.where(self.is_weekly, (today_ordinal - 1) // 7, today_ordinal)
+        ids, units, run_length, habit_starts = self._runs()
+        current = np.zeros(len(self.names), dtype=np.int64)
+        if len(habit_starts):
+            habit_ends = np.append(habit_starts[1:], len(units)) - 1
+            last_ids = ids[habit_ends]
+            # Rollover rule: the run ending at the last completion only counts if it ends today / this week
+            ends_today = units[habit_ends] == today_units[last_ids]
+            current[last_ids] = np.where(ends_today, run_length[habit_ends], 0)
+            # Habits with completions dated after today are rare; let Habit scan those
+            for habit_id in last_ids[units[habit_ends] > today_units[last_ids]].tolist():
+                current[habit_id] = self.habits[self.names[habit_id]].current_streak(today)
+        current[~self.is_tracked] = 0
+        return dict(zip(self.names, current.tolist()))
+
+    def longest_habit_streak(self, today=None):
+        """
+        Find the habit with the longest current streak, like HabitTracker.longest_habit_streak.
+
+        :param today: The reference date (datetime.date), defaults to today.
+        :return: A tuple (habit name, streak), or (None, 0) when no habit has a streak.
+        """
+        streaks = self.current_streaks(today)
+        longest_name, longest_streak = None, 0
+        for name in self.names:
+            if streaks[name] > longest_streak:
+                longest_name, longest_streak = name, streaks[name]
+        return longest_name, longest_streak
+
+    def completion_counts(self, first_day, last_day):
+        """
+        Count completions per habit between two dates, both included.
+
+        :param first_day: First date (datetime.date) of the range.
+        :param last_day: Last date (datetime.date) of the range.
+        :return: A dictionary mapping each habit name to its number of completions in the range.
+        """
+        first, last = first_day.toordinal(), last_day.toordinal()
+        if not self.use_numpy:
+            return {name: bisect_right(habit.ordinals, last) - bisect_left(habit.ordinals, first)
+                    for name, habit in self.habits.items()}
+        in_range = (self.ordinals >= first) & (self.ordinals <= last)
+        counts = np.bincount(self.habit_ids[in_range], minlength=len(self.names))
+        return dict(zip(self.names, counts.tolist()))
+
+    def monthly_counts(self):
+        """
+        Count completions per habit and calendar month in a single pass.
+
+        :return: A dictionary mapping (year, month) to a dictionary of habit name to number of completions.
+                 Only months with at least one completion are included.
+        """
+        if not self.use_numpy:
+            result = {}
+            for name, habit in self.habits.items():
+                for ordinal in habit.ordinals:
+                    day = date.fromordinal(ordinal)
+                    result.setdefault((day.year, day.month), dict.fromkeys(self.names, 0))[name] += 1
+            return result
+        months = (self.ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        result = {}
+        if not len(months):
+            return result
+        # One bincount over (month, habit) pairs gives the whole table
+        unique_months, month_index = np.unique(months, return_inverse=True)
+        table = np.bincount(month_index * len(self.names) + self.habit_ids,
+                            minlength=len(unique_months) * len(self.names)).reshape(len(unique_months), len(self.names))
+        for month, row in zip(unique_months.tolist(), table.tolist()):
+            result[(1970 + month // 12, month % 12 + 1)] = dict(zip(self.names, row))
+        return result
+
+    def struggle_scores(self, year, month):
+        """
+        Score how much each habit was struggled with in a month, with the same rule as
+        HabitTracker.habits_most_struggled: possible occurrences minus completed days (daily habits)
+        or completed ISO weeks (weekly habits).
+
+        :param year: The year of the month.
+        :param month: The month (1-12).
+        :return: A dictionary mapping each daily and weekly habit name to its struggle score; like the tracker,
+                 habits of any other type are left out.
+        """
+        if not self.use_numpy:
+            return {name: struggle_score(habit.habit_type, habit.rollup, year, month)
+                    for name, habit in self.habits.items() if habit.habit_type in ('daily', 'weekly')}
+        days_in_month = calendar.monthrange(year, month)[1]
+        counts = self.completion_counts(date(year, month, 1), date(year, month, days_in_month))
+        # Weekly habits: count the distinct weeks completed among the weeks whose Thursday is in the month
+        weeks = month_weeks(year, month)
+        ids, units = self._runs()[:2]
+        in_month = self.is_weekly[ids] & (units >= weeks.start) & (units < weeks.stop)
+        weeks_done = np.bincount(ids[in_month], minlength=len(self.names)).tolist()
+        return {name: month_opportunities(self.habits[name].habit_type, year, month) -
+                (weeks_done[index] if self.is_weekly[index] else counts[name])
+                for index, name in enumerate(self.names) if self.is_tracked[index]}
+
+    def most_struggled(self, year, month, top=3):
+        """
+        Rank habits by struggle score for a month, highest first, ties kept in habit order.
+
+        :param year: The year of the month.
+        :param month: The month (1-12).
+        :param top: The number of habits to return.
+        :return: A list of habit names.
+        """
+        scores = self.struggle_scores(year, month)
+        if not self.use_numpy:
+            return sorted(scores, key=scores.get, reverse=True)[:top]
+        names = list(scores)
+        values = np.fromiter(scores.values(), dtype=np.int64, count=len(names))
+        order = np.argsort(-values, kind='stable')[:top]
+        return [names[index] for index in order.tolist()]
+
+    def habits_of_type(self, habit_type):
+        """
+        :param habit_type: 'daily' or 'weekly'.
+        :return: The names of the habits of that type.
+        """
+        return [name for name in self.names if self.habits[name].habit_type == habit_type]
@@ -0,0 +1,69 @@
+import csv
+import json
+import os
+
+def normalize_operation(operation):
+    """
+    Turn one batch item into a mutation record.
+
+    :param operation: Either a (habit name, date) pair, meaning a completion, or a dictionary in the journal record
+                      format: {'op': 'complete', 'name', 'date'}, {'op': 'add', 'name', 'type'[, 'completion_dates']}
+                      or {'op': 'remove', 'name'}. 'habit' is accepted as an alias of 'name' and 'op' defaults to
+                      'complete' when a 'date' is given.
+    :return: The record as a dictionary.
+    """
+    if isinstance(operation, dict):
+        record = dict(operation)
+        if 'name' not in record and 'habit' in record:
+            record['name'] = record.pop('habit')
+        record.setdefault('op', 'complete' if 'date' in record else None)
+        return record
+    name, custom_date = operation
+    return {'op': 'complete', 'name': name, 'date': custom_date}
+
+def read_csv_operations(file_path):
+    """
+    Stream batch operations from a CSV file without loading it in memory.
+
+    The file needs a header row with at least 'habit' and 'date' columns for completions; optional 'op' and 'type'
+    columns allow 'add' and 'remove' rows.
+
+    :param file_path: Path of the CSV file.
+    :return: A generator of records.
+    """
+    with open(file_path, newline='') as f:
+        for row in csv.DictReader(f):
+            record = {key: value for key, value in row.items() if value not in (None, '')}
+            if record.get('op') == 'add':
+                record.setdefault('completion_dates', [])
+            yield normalize_operation(record)
+
+def read_jsonl_operations(file_path):
+    """
+    Stream batch operations from a JSON-lines file (one JSON object per line) without loading it in memory.
+
+    Lines that are not a JSON object or array yield an {'op': 'invalid', 'error'} record, rejected by the tracker,
+    so one bad line does not abort the import.
+
+    :param file_path: Path of the JSON-lines file.
+    :return: A generator of records.
+    """
+    with open(file_path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield normalize_operation(json.loads(line))
+            except (TypeError, ValueError):
+                yield {'op': 'invalid', 'error': f"Line {line_number}: not a valid operation."}
+
+def read_operations(file_path):
+    """
+    Stream batch operations from a .csv or JSON-lines (.jsonl, .ndjson) file.
+
+    :param file_path: Path of the file.
+    :return: A generator of records.
+    """
+    if os.path.splitext(os.fspath(file_path))[1].lower() == '.csv':
+        return read_csv_operations(file_path)
+    return read_jsonl_operations(file_path)
@@ -0,0 +1,150 @@
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from habit_classes.persistence import atomic_write
+
+# File layout (all integers little-endian):
+#   fixed header   magic, format version, habit count, size of the habit table, CRC-32 of everything after the
+#                  fixed header, byte offset of the ordinals, total number of ordinals
+#   habit table    for each habit: name length (u32), UTF-8 name, type length (u8), ASCII type
+#   offsets table  habit count + 1 entries (u64): habit i owns ordinals[offsets[i]:offsets[i + 1]]
+#   ordinals       one contiguous int32 array of sorted day ordinals, 8-byte aligned
+MAGIC = b'HBTS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIQQ')
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+def _padding(offset):
+    """Number of zero bytes needed to align offset to 8 bytes."""
+    return -offset % 8
+
+def write_binary_snapshot(file_path, habits):
+    """
+    Write habits atomically (see atomic_write) in the binary columnar format.
+
+    :param file_path: Destination path.
+    :param habits: A dictionary mapping habit names to Habit objects.
+    :return: The number of bytes written.
+    """
+    table = bytearray()
+    offsets = array('Q', [0])
+    columns = []
+    for name, habit in habits.items():
+        encoded_name = name.encode('utf-8')
+        encoded_type = habit.habit_type.encode('ascii')
+        table += struct.pack('<I', len(encoded_name)) + encoded_name + struct.pack('<B', len(encoded_type)) + encoded_type
+        columns.append(habit.ordinals)
+        offsets.append(offsets[-1] + len(habit.ordinals))
+    total = offsets[-1]
+    if not LITTLE_ENDIAN:
+        offsets.byteswap()
+    data_offset = HEADER.size + len(table) + len(offsets) * offsets.itemsize
+    body = [bytes(table), offsets.tobytes(), bytes(_padding(data_offset))]
+    data_offset += _padding(data_offset)
+    for ordinals in columns:
+        if LITTLE_ENDIAN:
+            body.append(ordinals.tobytes())
+        else:
+            swapped = array('i', ordinals)
+            swapped.byteswap()
+            body.append(swapped.tobytes())
+    checksum = 0
+    for chunk in body:
+        checksum = zlib.crc32(chunk, checksum)
+    header = HEADER.pack(MAGIC, VERSION, 0, len(habits), len(table), checksum, data_offset, total)
+
+    def write(f):
+        size = f.write(header)
+        for chunk in body:
+            size += f.write(chunk)
+        return size
+
+    return atomic_write(file_path, write, suffix='.hbt')
+
+class BinarySnapshot:
+    """
+    A read-only, memory-mapped view of a binary snapshot.
+
+    Only the header and the habit table are decoded when opening; the ordinals stay in the mapped file and are
+    exposed as zero-copy memoryviews.
+    """
+
+    def __init__(self, file_path, verify=True):
+        """
+        Open and map a snapshot.
+
+        :param file_path: Path of the snapshot.
+        :param verify: If True, check the CRC-32 of the whole file before using it.
+        :raises ValueError: If the file is not a snapshot, has an unsupported version or fails the checksum.
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open(verify)
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def _open(self, verify):
+        """Decode the header and the habit table."""
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"'{self.file_path}' is too short to be a habit snapshot.")
+        magic, version, _, count, table_size, checksum, data_offset, total = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{self.file_path}' is not a habit snapshot.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported habit snapshot version {version} in '{self.file_path}'.")
+        if verify and zlib.crc32(memoryview(self._mmap)[HEADER.size:]) != checksum:
+            raise ValueError(f"Checksum mismatch in '{self.file_path}': the file is corrupted.")
+
+        self.names = []
+        self.types = []
+        position = HEADER.size
+        for _ in range(count):
+            (name_length,) = struct.unpack_from('<I', self._mmap, position)
+            position += 4
+            self.names.append(self._mmap[position:position + name_length].decode('utf-8'))
+            position += name_length
+            type_length = self._mmap[position]
+            position += 1
+            self.types.append(self._mmap[position:position + type_length].decode('ascii'))
+            position += type_length
+        offsets_view = memoryview(self._mmap)[position:position + (count + 1) * 8]
+        ordinals_view = memoryview(self._mmap)[data_offset:data_offset + total * 4]
+        if LITTLE_ENDIAN:
+            self.offsets = offsets_view.cast('Q')
+            self.ordinals = ordinals_view.cast('i')
+        else:
+            # Big-endian hosts cannot use the little-endian data in place, so they get a swapped copy
+            self.offsets = array('Q', offsets_view.tobytes())
+            self.offsets.byteswap()
+            self.ordinals = array('i', ordinals_view.tobytes())
+            self.ordinals.byteswap()
+        self._index = {name: index for index, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def habit_ordinals(self, name):
+        """
+        :param name: The name of a habit.
+        :return: A zero-copy view of the habit's sorted day ordinals.
+        """
+        index = self._index[name]
+        return self.ordinals[self.offsets[index]:self.offsets[index + 1]]
+
+    def close(self):
+        """
+        Release the views and unmap the file. If zero-copy views handed out earlier are still alive,
+        the mapping is left to be released by the garbage collector instead.
+        """
+        try:
+            if isinstance(self.ordinals, memoryview):
+                self.offsets.release()
+                self.ordinals.release()
+            self._mmap.close()
+        except BufferError:
+            pass
@@ -0,0 +1,126 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+
+class CompletionIndex:
+    """
+    An inverted index of the completion history: for every day with at least one completion, the set of habits
+    completed that day, plus the sorted array of those days.
+
+    Range queries binary-search the sorted days and then only visit days inside the range, so their cost is
+    proportional to the size of the result rather than to the whole history. The index is updated incrementally
+    through add, add_range, add_habit and remove_habit.
+    """
+
+    def __init__(self, habits=None):
+        """
+        :param habits: Optional dictionary mapping habit names to Habit objects to index.
+        """
+        self._habits_by_day = {}
+        self._days = array('i')
+        if habits:
+            for name, habit in habits.items():
+                for ordinal in habit.ordinals:
+                    self._habits_by_day.setdefault(ordinal, set()).add(name)
+            self._days = array('i', sorted(self._habits_by_day))
+
+    def __len__(self):
+        """The number of days with at least one completion."""
+        return len(self._days)
+
+    def add(self, name, ordinal):
+        """Record that a habit was completed on a day."""
+        names = self._habits_by_day.get(ordinal)
+        if names is None:
+            names = self._habits_by_day[ordinal] = set()
+            if not self._days or ordinal > self._days[-1]:
+                self._days.append(ordinal)
+            else:
+                insort(self._days, ordinal)
+        names.add(name)
+
+    def add_range(self, name, first, last):
+        """Record that a habit was completed on every day from first to last, both included."""
+        self.add_habit(name, range(first, last + 1))
+
+    def add_habit(self, name, ordinals):
+        """
+        Index many completions of a habit at once, e.g. a new habit's history.
+
+        :param name: The name of the habit.
+        :param ordinals: The sorted day ordinals of the completions.
+        """
+        new_days = []
+        for ordinal in ordinals:
+            names = self._habits_by_day.get(ordinal)
+            if names is None:
+                names = self._habits_by_day[ordinal] = set()
+                new_days.append(ordinal)
+            names.add(name)
+        if not new_days:
+            return
+        if not self._days or new_days[0] > self._days[-1]:
+            self._days.extend(new_days)
+        else:
+            # The new days are merged into the sorted array in one pass rather than inserted one at a time
+            self._days = array('i', merge(self._days, new_days))
+
+    def remove_habit(self, name, ordinals):
+        """
+        Drop every completion of a habit.
+
+        :param name: The name of the habit.
+        :param ordinals: The habit's completion ordinals.
+        """
+        emptied = set()
+        for ordinal in ordinals:
+            names = self._habits_by_day.get(ordinal)
+            if names is None:
+                continue
+            names.discard(name)
+            if not names:
+                del self._habits_by_day[ordinal]
+                emptied.add(ordinal)
+        if emptied:
+            # Rebuild the sorted days once instead of deleting each emptied day from the array
+            self._days = array('i', [ordinal for ordinal in self._days if ordinal not in emptied])
+
+    def days_between(self, first, last):
+        """
+        :return: The sorted day ordinals from first to last, both included, that have at least one completion.
+        """
+        return self._days[bisect_left(self._days, first):bisect_right(self._days, last)]
+
+    def habits_on(self, ordinal):
+        """
+        :return: The set of habits completed on a day (empty if none). Do not modify it.
+        """
+        return self._habits_by_day.get(ordinal, frozenset())
+
+    def habits_between(self, first, last):
+        """
+        :return: The set of habits completed at least once from first to last, both included.
+        """
+        result = set()
+        for ordinal in self.days_between(first, last):
+            result |= self._habits_by_day[ordinal]
+        return result
+
+    def counts_between(self, first, last):
+        """
+        :return: A dictionary mapping each day ordinal with completions, from first to last, to its number of
+                 completed habits.
+        """
+        return {ordinal: len(self._habits_by_day[ordinal]) for ordinal in self.days_between(first, last)}
+
+    def empty_days(self, first, last):
+        """
+        :return: The day ordinals from first to last, both included, without any completion.
+        """
+        result = []
+        expected = first
+        for ordinal in self.days_between(first, last):
+            result.extend(range(expected, ordinal))
+            expected = ordinal + 1
+        result.extend(range(expected, last + 1))
+        return result
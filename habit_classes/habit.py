@@ -1,70 +1,454 @@
-from datetime import datetime, timedelta
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from datetime import date, datetime
+from habit_classes.instrumentation import instrumented, metrics
+from habit_classes.rollups import CompletionRollup
+
+def date_to_ordinal(date_str):
+    """
+    Convert a 'YYYY-MM-DD' string into a day ordinal (days since 0001-01-01, as returned by date.toordinal).
+
+    :param date_str: The date string to convert.
+    :return: The day ordinal as an int.
+    """
+    if metrics.enabled:
+        metrics.count('dates_parsed')
+    return date.fromisoformat(date_str).toordinal()
+
+def ordinal_to_date(ordinal):
+    """
+    Convert a day ordinal back into a 'YYYY-MM-DD' string.
+
+    :param ordinal: The day ordinal to convert.
+    :return: The date as a string.
+    """
+    return date.fromordinal(ordinal).isoformat()
+
+class CompletionDates(Sequence):
+    """
+    A read-only view of a habit's sorted completion ordinals as 'YYYY-MM-DD' strings.
+
+    It behaves like the list of strings Habit used to store, which keeps the JSON schema and existing callers working,
+    while membership tests are a binary search instead of a linear scan.
+    """
+
+    __slots__ = ('_habit',)
+
+    def __init__(self, habit):
+        self._habit = habit
+
+    def __len__(self):
+        return len(self._habit.ordinals)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ordinal_to_date(ordinal) for ordinal in self._habit.ordinals[index]]
+        return ordinal_to_date(self._habit.ordinals[index])
+
+    def __iter__(self):
+        return map(ordinal_to_date, self._habit.ordinals)
+
+    def __contains__(self, date_str):
+        try:
+            return self._habit.has_completion(date_to_ordinal(date_str))
+        except (TypeError, ValueError):
+            return False
+
+    def __eq__(self, other):
+        if isinstance(other, CompletionDates):
+            return self._habit.ordinals == other._habit.ordinals
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
 
 class Habit:
     """
     Represents a habit with a name, type, and list of completion dates.
     Supports operations to verify the current streak of habit completion.
+
+    Completion dates are kept as a sorted array of day ordinals without duplicates; completion_dates exposes
+    them as 'YYYY-MM-DD' strings for JSON compatibility.
+
+    Streak state is maintained incrementally in 'units' (days for daily habits, Monday-based weeks for weekly ones):
+    the last completed unit, the length of the run of consecutive units ending there and the longest run ever.
+
+    A habit can also be created lazily with only its name and type: its completion history is then loaded the first
+    time it is needed.
+
+    Completion counts per month and ISO week (see rollup) are built on first use and then kept up to date.
+    The version counter grows with every change of the history, so caches can tell when they are stale.
     """
-    
+
+    __slots__ = ('name', 'habit_type', '_ordinals', '_loader', '_last_unit', '_run_length', '_longest_run', '_rollup',
+                 '_version')
+
     def __init__(self, name, habit_type, completion_dates):
         """
         Initializes a Habit object with its name, type, and completion dates.
 
         :param name: The name of the habit.
         :param habit_type: The type of the habit ('daily' or 'weekly').
-        :param completion_dates: A list of dates (strings) when the habit was completed.
+        :param completion_dates: A list of dates (strings) when the habit was completed, in any order.
         """
         self.name = name
         self.habit_type = habit_type
+        self._loader = None
+        self._version = 0
         self.completion_dates = completion_dates
 
-    def verify_streak(self):
+    @classmethod
+    def from_ordinals(cls, name, habit_type, ordinals):
         """
-        Calculate the current streak of completed habit occurrences based on its type.
+        Build a Habit directly from day ordinals, skipping any date parsing.
 
-        For 'daily' habits, it counts the number of consecutive days up to today.
-        For 'weekly' habits, it checks completions week by week without missing any week up to the current week.
+        :param name: The name of the habit.
+        :param habit_type: The type of the habit ('daily' or 'weekly').
+        :param ordinals: An iterable of day ordinals, in any order.
+        :return: The new Habit.
+        """
+        habit = cls(name, habit_type, [])
+        habit.ordinals = array('i', sorted(set(ordinals)))
+        habit._rebuild_streak_state()
+        return habit
 
-        :return: The length of the current streak in days (for daily habits) or weeks (for weekly habits).
+    @classmethod
+    def lazy(cls, name, habit_type, loader, rollup=None):
+        """
+        Build a Habit whose completion history is only loaded when first used.
+
+        :param name: The name of the habit.
+        :param habit_type: The type of the habit ('daily' or 'weekly').
+        :param loader: A function without arguments returning either the list of completion date strings,
+                       or a buffer (array or memoryview) of already sorted, unique day ordinals.
+        :param rollup: Optional persisted CompletionRollup of the history, so reports do not need to load it.
+        :return: The new Habit.
+        """
+        habit = cls.__new__(cls)
+        habit.name = name
+        habit.habit_type = habit_type
+        habit._ordinals = None
+        habit._loader = loader
+        habit._rollup = rollup
+        habit._version = 0
+        return habit
+
+    @property
+    def is_loaded(self):
+        """False while the completion history of a lazily created habit has not been loaded yet."""
+        return self._ordinals is not None
+
+    def load(self):
+        """Load the completion history of a lazily created habit now, if it has not been loaded yet."""
+        if self._ordinals is None:
+            self._hydrate()
+
+    @property
+    def lazy_source(self):
+        """The loader of a lazily created habit whose history has not been loaded yet, None once it is loaded."""
+        return self._loader if self._ordinals is None else None
+
+    def repoint(self, loader):
+        """
+        Point a habit whose history has not been loaded yet at another loader of the same history, e.g. when the
+        snapshot it would be read from was rewritten. Does nothing once the history is loaded.
+
+        :param loader: The new loader (see lazy).
+        """
+        if self._ordinals is None:
+            self._loader = loader
+
+    def _hydrate(self):
+        """Load the completion history of a lazily created habit."""
+        loader, self._loader = self._loader, None
+        rollup, version = self._rollup, self._version
+        loaded = loader()
+        if isinstance(loaded, (array, memoryview)):
+            # Ordinals from a binary snapshot are copied as they are, without any parsing
+            self.ordinals = array('i', loaded)
+            self._rebuild_streak_state()
+        else:
+            self.completion_dates = loaded
+        # Loading is not a change: the persisted rollup and the version stay valid
+        self._rollup = rollup
+        self._version = version
+
+    @property
+    def ordinals(self):
+        """The sorted array of completion day ordinals. Read-only: use add_completion to change it."""
+        if self._ordinals is None:
+            self._hydrate()
+        return self._ordinals
+
+    @ordinals.setter
+    def ordinals(self, ordinals):
+        self._ordinals = ordinals
+        self._loader = None
+        self._rollup = None
+        self._version += 1
+
+    @property
+    def version(self):
+        """A counter increased by every change of the completion history."""
+        return self._version
+
+    @property
+    def rollup(self):
+        """The CompletionRollup (completions per month and ISO week) of the history, built on first use."""
+        if self._rollup is None:
+            self._rollup = CompletionRollup.from_ordinals(self.ordinals)
+        return self._rollup
+
+    @property
+    def completion_dates(self):
+        """The completion dates as a sorted, read-only sequence of 'YYYY-MM-DD' strings."""
+        return CompletionDates(self)
+
+    @completion_dates.setter
+    def completion_dates(self, completion_dates):
+        self.ordinals = array('i', sorted({date.fromisoformat(d).toordinal() for d in completion_dates}))
+        if metrics.enabled:
+            metrics.count('dates_parsed', len(completion_dates))
+        self._rebuild_streak_state()
+
+    def unit_of(self, ordinal):
+        """
+        Map a day ordinal to the unit streaks are counted in.
+
+        Ordinal 1 (0001-01-01) is a Monday, so for weekly habits (ordinal - 1) // 7 numbers the weeks from Monday to Sunday.
+
+        :param ordinal: The day ordinal.
+        :return: The day ordinal itself for daily habits, the week number for weekly habits.
+        """
+        if self.habit_type == 'weekly':
+            return (ordinal - 1) // 7
+        return ordinal
+
+    def _rebuild_streak_state(self):
+        """Recompute the streak state from scratch with a single pass over the sorted ordinals."""
+        self._last_unit = None
+        self._run_length = 0
+        self._longest_run = 0
+        for ordinal in self.ordinals:
+            self._append_unit(self.unit_of(ordinal))
+
+    def _append_unit(self, unit):
+        """Update the streak state for a completion in a unit not earlier than the last one, in O(1)."""
+        if unit == self._last_unit:
+            # Another completion in the same week does not extend a weekly streak
+            return
+        if self._last_unit is not None and unit == self._last_unit + 1:
+            self._run_length += 1
+        else:
+            self._run_length = 1
+        self._last_unit = unit
+        if self._run_length > self._longest_run:
+            self._longest_run = self._run_length
+
+    def _insert_unit(self, index, unit):
+        """
+        Update the streak state for a back-dated completion inserted at position index of the ordinals.
+
+        Only the run the new unit belongs to is recounted: the consecutive units right before and right after it.
+        """
+        ordinals = self.ordinals
+        # A weekly habit may already have another completion in the same week, in which case no run changes
+        if (index > 0 and self.unit_of(ordinals[index - 1]) == unit) or \
+                (index + 1 < len(ordinals) and self.unit_of(ordinals[index + 1]) == unit):
+            return
+        # Walk down from the new unit while the units stay consecutive
+        before, expected, position = 0, unit - 1, index - 1
+        while position >= 0:
+            current = self.unit_of(ordinals[position])
+            if current == expected:
+                before += 1
+                expected -= 1
+            elif current != expected + 1:
+                break
+            position -= 1
+        # Walk up the same way
+        after, expected, position = 0, unit + 1, index + 1
+        while position < len(ordinals):
+            current = self.unit_of(ordinals[position])
+            if current == expected:
+                after += 1
+                expected += 1
+            elif current != expected - 1:
+                break
+            position += 1
+        merged_run = before + 1 + after
+        if unit + after == self._last_unit:
+            # The affected run is the one ending at the last completion
+            self._run_length = merged_run
+        if merged_run > self._longest_run:
+            self._longest_run = merged_run
+
+    def has_completion(self, ordinal):
+        """
+        Check whether the habit was completed on the given day.
+
+        :param ordinal: The day ordinal to look up.
+        :return: True if the habit was completed on that day.
+        """
+        index = bisect_left(self.ordinals, ordinal)
+        return index < len(self.ordinals) and self.ordinals[index] == ordinal
+
+    def add_completion(self, completion_date):
+        """
+        Mark the habit as completed on a day, keeping the dates sorted.
+
+        :param completion_date: The day as a 'YYYY-MM-DD' string or as a day ordinal.
+        :return: True if the date was added, False if the habit was already completed on that day.
+        """
+        ordinal = date_to_ordinal(completion_date) if isinstance(completion_date, str) else completion_date
+        ordinals = self.ordinals
+        # Fast path: completions are almost always added in chronological order
+        if not ordinals or ordinal > ordinals[-1]:
+            ordinals.append(ordinal)
+            self._append_unit(self.unit_of(ordinal))
+        else:
+            index = bisect_left(ordinals, ordinal)
+            if ordinals[index] == ordinal:
+                return False
+            ordinals.insert(index, ordinal)
+            self._insert_unit(index, self.unit_of(ordinal))
+        if self._rollup is not None:
+            self._rollup.add(ordinal)
+        self._version += 1
+        return True
+
+    def backfill_until(self, ordinal):
+        """
+        Mark the habit as completed on every day after its last completion up to and including ordinal.
+
+        Only the gap is generated and it is appended in order, so the cost is linear in the gap, not in the history.
+        The streak state is updated in O(1): the gap covers every day (and so every week) after the last completion.
+
+        :param ordinal: The day ordinal to fill up to, usually today's.
+        :return: The number of dates added.
+        """
+        ordinals = self.ordinals
+        if not ordinals or ordinal <= ordinals[-1]:
+            return 0
+        first = ordinals[-1] + 1
+        ordinals.extend(range(first, ordinal + 1))
+        if self._rollup is not None:
+            self._rollup.add_range(first, ordinal)
+        self._version += 1
+        last_unit = self.unit_of(ordinal)
+        if last_unit > self._last_unit:
+            self._run_length += last_unit - self._last_unit
+            self._last_unit = last_unit
+            self._longest_run = max(self._longest_run, self._run_length)
+        return ordinal - first + 1
+
+    def current_streak(self, today=None):
+        """
+        Return the current streak from the cached streak state.
+
+        Rollover rule: the cached run only counts while its last unit is today's day (daily) or this week (weekly).
+        Once the day or week rolls over without a completion the streak is 0. Completions dated after today are
+        not covered by the cache, so in that rare case the history is scanned instead.
+
+        :param today: The reference date (datetime.date), defaults to today.
+        :return: The length of the current streak in days (daily habits) or weeks (weekly habits).
+        """
+        if self.habit_type not in ('daily', 'weekly'):
+            return 0
+        if self._ordinals is None:
+            self._hydrate()
+        if today is None:
+            today = datetime.today().date()
+        today_unit = self.unit_of(today.toordinal())
+        if self._last_unit is None or self._last_unit < today_unit:
+            return 0
+        if self._last_unit == today_unit:
+            return self._run_length
+        return self._scan_streak(today)
+
+    def longest_streak(self):
+        """
+        Return the longest run of consecutive days (daily habits) or weeks (weekly habits) ever completed.
+        """
+        if self._ordinals is None:
+            self._hydrate()
+        return self._longest_run
+
+    def streak_segments(self):
+        """
+        Split the history into runs of consecutive days (daily habits) or weeks (weekly habits), in one pass.
+
+        :return: A list of (first unit, last unit, first completion ordinal, last completion ordinal) tuples,
+                 oldest run first. Units are day ordinals or week numbers, see unit_of.
+        """
+        segments = []
+        for ordinal in self.ordinals:
+            unit = self.unit_of(ordinal)
+            if segments and unit <= segments[-1][1] + 1:
+                # Same unit (another completion in the same week) or the next one: the run goes on
+                segments[-1] = (segments[-1][0], unit, segments[-1][2], ordinal)
+            else:
+                segments.append((unit, unit, ordinal, ordinal))
+        return segments
+
+    def _scan_streak(self, today):
+        """
+        Compute the current streak by walking the history backwards from today, without using the cached state.
+
+        :param today: The reference date (datetime.date).
+        :return: The length of the current streak.
         """
         streak_counter = 0
-        today = datetime.today().date()
-        date_check = today
-        sorted_dates = sorted([datetime.strptime(d, '%Y-%m-%d').date() for d in self.completion_dates])        
+        date_check = today.toordinal()
         if self.habit_type == 'daily':
-
             # Iterate over each day backwards from today, checking if the habit was completed.
-            print("Today:", today)  # Debugging: Print today's date
-            for date in reversed(sorted_dates):
-                print("Checking:", date, "against", date_check)  # Debugging: Print the comparison being made
-                if date == date_check:
+            for ordinal in reversed(self.ordinals):
+                if ordinal == date_check:
                     streak_counter += 1
-                    date_check -= timedelta(days=1)
+                    date_check -= 1
                 else:
                     break
-            print("Streak counter:", streak_counter)  # Debugging: Print the final streak count
-
         elif self.habit_type == 'weekly':
-            day_or_week = "weeks";
-            # Sort the completion dates and iterate week by week.
-            if sorted_dates:
-                current_week_start = today - timedelta(days=today.weekday())
-                for date in sorted_dates[::-1]:
-                    week_start = date - timedelta(days=date.weekday())
-                    if current_week_start == week_start:
-                        streak_counter += 1
-                        current_week_start -= timedelta(weeks=1)
-                    elif week_start < current_week_start:
-                        break
+            # Iterate week by week; completions later than the current week are skipped.
+            current_week = self.unit_of(date_check)
+            for ordinal in reversed(self.ordinals):
+                week = self.unit_of(ordinal)
+                if current_week == week:
+                    streak_counter += 1
+                    current_week -= 1
+                elif week < current_week:
+                    break
+        return streak_counter
 
+    @instrumented('verify_streak')
+    def verify_streak(self, today=None):
+        """
+        Calculate the current streak of completed habit occurrences based on its type.
+
+        For 'daily' habits, it counts the number of consecutive days up to today.
+        For 'weekly' habits, it checks completions week by week without missing any week up to the current week.
+
+        :param today: The reference date (datetime.date), defaults to today.
+        :return: The length of the current streak in days (for daily habits) or weeks (for weekly habits).
+        """
+        if today is None:
+            today = datetime.today().date()
+        streak_counter = self.current_streak(today)
+        if metrics.enabled:
+            metrics.debug("Today:", today, "Streak counter:", streak_counter)  # Debugging: only with metrics enabled
         return streak_counter
 
     def day_or_week(self):
-    
+
         if self.habit_type == 'daily':
             day_or_week = "days";
 
         elif self.habit_type == 'weekly':
-            day_or_week = "weeks";  
-            
-        return day_or_week
\ No newline at end of file
+            day_or_week = "weeks";
+
+        return day_or_week
@@ -1,94 +1,472 @@
-import json
-import os
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from habit_classes.analytics import HabitAnalytics
+from habit_classes.batch_import import normalize_operation, read_operations
+from habit_classes.completion_index import CompletionIndex
 from habit_classes.habit import Habit
+from habit_classes.instrumentation import instrumented, metrics
+from habit_classes.rollups import adherence, habits_month_done, month_done, month_opportunities, months_between
+from habit_classes.storage import open_storage
+from habit_classes.streak_cache import StreakCache
 
 class HabitTracker:
     """A class to track, add, update, and delete habits stored in a JSON file."""
 
-    def __init__(self, json_file_path):
-        """Initialize HabitTracker with a path to a JSON file."""
+    # Ways of resolving a habit changed both by another process and by unflushed local mutations
+    CONFLICT_POLICIES = ('merge', 'local', 'external')
+
+    def __init__(self, json_file_path, journal=False, compact_threshold=1000, storage=None, autosave=True, lazy=False,
+                 conflict_policy='merge'):
+        """
+        Initialize HabitTracker with a path to a data file.
+
+        :param json_file_path: Path to the file holding the habits. JSON by default, SQLite for .db/.sqlite files.
+        :param journal: If True, mutations are appended to a journal next to the JSON file instead of rewriting it.
+        :param compact_threshold: Number of journal records after which the journal is folded into the snapshot.
+        :param storage: An explicit StorageBackend to use instead of picking one from the file extension.
+        :param autosave: If True every mutation is persisted immediately. If False mutations only mark the tracker
+                         dirty and are written together by the next call to flush().
+        :param lazy: If True, only habit names and types are read on startup and each habit's completion history
+                     is parsed the first time it is used (JSON files only).
+        :param conflict_policy: How check_external_changes resolves habits changed both externally and locally:
+                                'merge' (union of the completion dates), 'local' or 'external' (that side wins).
+        """
+        if conflict_policy not in self.CONFLICT_POLICIES:
+            raise ValueError(f"conflict_policy must be one of {', '.join(self.CONFLICT_POLICIES)}.")
         self.json_file_path = json_file_path
+        if storage is None:
+            storage = open_storage(json_file_path, journal=journal, compact_threshold=compact_threshold, lazy=lazy)
+        self.storage = storage
+        self.autosave = autosave
+        self.conflict_policy = conflict_policy
         self.habits = self.load_habits()
+        # Fingerprint of the stored state as of the last load or write of this tracker
+        self._signature = self.storage.signature()
+        self._analytics = None
+        self._index = None
+        self._pending = []
+        # Memoized streaks, recomputed only when a habit changes or the day rolls over
+        self.streak_cache = StreakCache()
 
-    def fill_missing_dates(self):
+    @instrumented('fill_missing_dates')
+    def fill_missing_dates(self, today=None):
         """
-        Fills in missing completion dates for each 'daily' habit up to today's date.
+        Fills in missing completion dates for each habit from its last completion up to today's date.
+        Habits without any completion date are skipped. The filled dates are not saved right away: each filled range
+        is queued as one 'fill' mutation record, written by the next flush, save or close like any other mutation.
+
+        :param today: The date (datetime.date) to fill up to, defaults to today.
+        :return: A dictionary mapping the name of every habit that got new dates to the number of dates filled.
         """
-        today = datetime.today().date()
-        for habit in self.habits.values():
-            # Skip if there are no completion dates
-            if not habit.completion_dates:
+        today = today or datetime.today().date()
+        today_ordinal = today.toordinal()
+        filled = {}
+        records = []
+        for name, habit in self.habits.items():
+            # The dates are kept sorted, so only the gap after the last completion can be missing
+            count = habit.backfill_until(today_ordinal)
+            if count:
+                filled[name] = count
+                records.append({'op': 'fill', 'name': name,
+                                'first': date.fromordinal(today_ordinal - count + 1).isoformat(),
+                                'last': today.isoformat()})
+                if self._index is not None:
+                    self._index.add_range(name, today_ordinal - count + 1, today_ordinal)
+        if records:
+            self._analytics = None
+            self._pending.extend(records)
+        return filled
+
+    @instrumented('load')
+    def load_habits(self):
+        """Load habits from the storage backend."""
+        return self.storage.load()
+
+    @instrumented('save')
+    def save_habits(self):
+        """Save the current habits to the storage backend, replacing what was stored before."""
+        self.storage.save(self.habits)
+        self._signature = self.storage.signature()
+        self._pending = []
+
+    @property
+    def dirty(self):
+        """True when there are mutations that have not been written to storage yet."""
+        return bool(self._pending)
+
+    @instrumented('flush')
+    def flush(self):
+        """
+        Write all pending mutations to storage in one go. Does nothing when the tracker is not dirty.
+
+        Changes made to the file by another process since this tracker last read or wrote it are merged first
+        (see check_external_changes), so they are never overwritten with a stale state.
+
+        :return: True if something was written.
+        """
+        if not self._pending:
+            return False
+        self.check_external_changes()
+        if not self._pending:
+            # Resolving a conflict already wrote everything
+            return True
+        pending, self._pending = self._pending, []
+        try:
+            self.storage.apply(pending, self.habits)
+        except BaseException:
+            # Keep the mutations for the next attempt instead of dropping them with the failed write
+            self._pending = pending + self._pending
+            raise
+        self._signature = self.storage.signature()
+        return True
+
+    @instrumented('compact')
+    def compact(self):
+        """Fold any journaled mutations back into the snapshot that load_habits reads on startup."""
+        self.storage.compact(self.habits)
+        self._signature = self.storage.signature()
+
+    @instrumented('check_external_changes')
+    def check_external_changes(self, policy=None):
+        """
+        Detect modifications of the stored habits by another process and merge them into memory, habit by habit.
+
+        Detection is a cheap fingerprint comparison (a stat of the file, or SQLite's data_version). When the file
+        did change, the backend compares per-habit checksums of the stored data with the in-memory habits (see
+        StorageBackend.reload), so Habit objects are built only for habits added or changed externally; unchanged
+        habits keep their objects and caches, and lazy ones stay unloaded. A habit that also has unflushed local
+        mutations is a conflict, resolved with the policy; the resolved state is then written back.
+
+        :param policy: 'merge', 'local' or 'external', defaults to the tracker's conflict_policy.
+        :return: None when nothing changed, otherwise a dictionary with the lists of 'added', 'removed', 'changed'
+                 and 'conflicts' habit names.
+        """
+        policy = policy or self.conflict_policy
+        signature = self.storage.signature()
+        if signature is None or signature == self._signature:
+            return None
+        external = self.storage.reload(self.habits)
+        self._signature = signature
+        # What the unflushed local mutations did, to tell local changes apart from external ones
+        touched, added_locally, completed_locally = set(), set(), {}
+        for record in self._pending:
+            touched.add(record.get('name'))
+            if record.get('op') == 'add':
+                added_locally.add(record.get('name'))
+            elif record.get('op') == 'complete':
+                completed_locally.setdefault(record['name'], set()).add(date.fromisoformat(record['date']).toordinal())
+            elif record.get('op') == 'fill':
+                completed_locally.setdefault(record['name'], set()).update(
+                    range(date.fromisoformat(record['first']).toordinal(),
+                          date.fromisoformat(record['last']).toordinal() + 1))
+        changes = {'added': [], 'removed': [], 'changed': [], 'conflicts': []}
+        resolved = set()
+
+        for name in [name for name in self.habits if name not in external]:
+            if name in added_locally:
+                # Not written yet, not removed externally
                 continue
+            if name in touched:
+                changes['conflicts'].append(name)
+                if policy != 'external':
+                    # Kept locally: the next write has to put it back
+                    resolved.add(name)
+                    continue
+            self._drop_habit(name)
+            changes['removed'].append(name)
+        for name, theirs in external.items():
+            if theirs is None:
+                # Same checksum as in memory: nothing to do
+                continue
+            ours = self.habits.get(name)
+            if name in touched:
+                if ours is None:
+                    # Removed locally: the pending removal stands
+                    continue
+                local_only = completed_locally.get(name, ())
+                if name not in added_locally and ours.habit_type == theirs.habit_type and \
+                        list(theirs.ordinals) == [ordinal for ordinal in ours.ordinals if ordinal not in local_only]:
+                    # Only changed locally: the pending mutations apply as they are
+                    continue
+                changes['conflicts'].append(name)
+                if policy == 'external':
+                    self._replace_habit(name, theirs)
+                elif policy == 'merge':
+                    # Union of both histories; the local habit type wins
+                    for ordinal in theirs.ordinals:
+                        if ours.add_completion(ordinal) and self._index is not None:
+                            self._index.add(name, ordinal)
+                    resolved.add(name)
+                else:
+                    resolved.add(name)
+            elif ours is None:
+                self._replace_habit(name, theirs)
+                changes['added'].append(name)
+            elif not ours.is_loaded or ours.habit_type != theirs.habit_type or ours.ordinals != theirs.ordinals:
+                # A lazy habit never read locally is known to differ from its checksum alone
+                self._replace_habit(name, theirs)
+                changes['changed'].append(name)
 
-            # Generate a set of all dates from the start date to today
-            start_date = max(datetime.strptime(d, '%Y-%m-%d').date() for d in habit.completion_dates)
-            all_dates = {start_date + timedelta(days=x) for x in range((today - start_date).days + 1)}
-            
-            # Convert completion_dates to a set of datetime.date objects for easier comparison
-            completion_date_objs = {datetime.strptime(d, '%Y-%m-%d').date() for d in habit.completion_dates}
-            
-            # Find missing dates and add them
-            missing_dates = all_dates - completion_date_objs
-            habit.completion_dates.extend([date.strftime('%Y-%m-%d') for date in missing_dates])
+        if policy == 'external':
+            self._pending = [record for record in self._pending if record.get('name') not in changes['conflicts']]
+        self._analytics = None
+        if resolved:
+            # The stored state lacks what was kept locally: write the resolved state in full
+            self.save_habits()
+        return changes
 
-            # Sort the dates after adding the missing ones
-            habit.completion_dates = sorted(habit.completion_dates, key=lambda d: datetime.strptime(d, '%Y-%m-%d'))
+    def _drop_habit(self, name):
+        """Remove a habit from memory and from the completion index, without recording a mutation."""
+        if self._index is not None:
+            self._index.remove_habit(name, self.habits[name].ordinals)
+        self.streak_cache.discard(name)
+        del self.habits[name]
 
-    def load_habits(self):
-        """Load habits from the specified JSON file."""
-        if os.path.isfile(self.json_file_path):
-            with open(self.json_file_path, 'r') as f:
-                data = json.load(f)
-            return {name: Habit(name, info['type'], info['completion_dates']) for name, info in data.items()}
-        return {}
+    def _replace_habit(self, name, habit):
+        """Put a habit read from storage in place of the in-memory one, without recording a mutation."""
+        if self._index is not None:
+            if name in self.habits:
+                self._index.remove_habit(name, self.habits[name].ordinals)
+            self._index.add_habit(name, habit.ordinals)
+        self.habits[name] = habit
 
-    def save_habits(self):
-        """Save the current habits to the JSON file."""
-        with open(self.json_file_path, 'w') as f:
-            data = {name: {'type': habit.habit_type, 'completion_dates': habit.completion_dates}
-                    for name, habit in self.habits.items()}
-            json.dump(data, f, indent=4)
+    def close(self):
+        """Write any pending mutation and release the resources held by the storage backend."""
+        self.flush()
+        self.storage.close()
 
+    def _persist(self, *records):
+        """
+        Hand mutations that have already been applied in memory over to the storage backend,
+        or queue them for the next flush() when autosave is off.
+        """
+        self._analytics = None
+        self._pending.extend(records)
+        if self.autosave:
+            self.flush()
+
+    def analytics(self):
+        """
+        Return a HabitAnalytics snapshot of all habits for bulk queries (vectorized when NumPy is installed).
+
+        The snapshot is reused until the next mutation.
+        """
+        if self._analytics is None:
+            self._analytics = HabitAnalytics(self.habits)
+        return self._analytics
+
+    @instrumented('add_habit')
     def add_habit(self, name, habit_type, completion_dates):
         """Add a new habit to the tracker."""
-        if name not in self.habits:
-            self.habits[name] = Habit(name, habit_type, completion_dates)
-            self.save_habits()
+        message, record = self._add(name, habit_type, completion_dates, datetime.today().date())
+        if record is not None:
+            self._persist(record)
+        return message
 
+    @instrumented('update_habit_custom_date')
     def update_habit_custom_date(self, name, custom_date):
         """Update a habit's completion with a custom date."""
+        message, record = self._complete(name, custom_date, datetime.today().date())
+        if record is not None:
+            self._persist(record)
+        return message
+
+    @instrumented('remove_habit')
+    def remove_habit(self, name):
+        """Remove a habit from the tracker by name."""
+        message, record = self._remove(name)
+        if record is not None:
+            self._persist(record)
+        return message
+
+    def _add(self, name, habit_type, completion_dates, today):
+        """
+        Validate and apply the addition of a habit in memory.
+
+        :return: A tuple (message, mutation record or None if nothing changed).
+        """
+        if not isinstance(name, str) or not name:
+            return "A habit needs a non-empty name.", None
+        if habit_type not in ('daily', 'weekly'):
+            return f"Invalid habit type: {habit_type}. Please use 'daily' or 'weekly'.", None
+        if name in self.habits:
+            return f"Habit '{name}' already exists.", None
+        if not isinstance(completion_dates, (list, tuple)):
+            return "Completion dates must be a list of YYYY-MM-DD dates.", None
+        ordinals = []
+        canonical_dates = []
+        for custom_date in completion_dates:
+            try:
+                custom_date_obj = datetime.strptime(custom_date, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                return "Invalid date format. Please use YYYY-MM-DD.", None
+            if custom_date_obj > today:
+                return "Cannot add a habit with a future date.", None
+            ordinals.append(custom_date_obj.toordinal())
+            # strptime also accepts unpadded dates such as 2024-1-5: records keep the zero-padded form every loader reads
+            canonical_dates.append(custom_date_obj.isoformat())
+        if metrics.enabled:
+            metrics.count('dates_parsed', len(ordinals))
+        self.habits[name] = Habit.from_ordinals(name, habit_type, ordinals)
+        if self._index is not None:
+            self._index.add_habit(name, self.habits[name].ordinals)
+        return f"Added habit: {name} ({habit_type})", {'op': 'add', 'name': name, 'type': habit_type,
+                                                       'completion_dates': canonical_dates}
+
+    def _complete(self, name, custom_date, today):
+        """
+        Validate and apply a completion in memory.
+
+        :return: A tuple (message, mutation record or None if nothing changed).
+        """
         try:
             custom_date_obj = datetime.strptime(custom_date, '%Y-%m-%d').date()
-        except ValueError:
-            return "Invalid date format. Please use YYYY-MM-DD."
-        if custom_date_obj > datetime.today().date():
-            return "Cannot update habit with a future date."
+            if metrics.enabled:
+                metrics.count('dates_parsed')
+        except (TypeError, ValueError):
+            return "Invalid date format. Please use YYYY-MM-DD.", None
+        # The zero-padded form goes into the record, as loaders parse dates with date.fromisoformat
+        custom_date = custom_date_obj.isoformat()
+        if custom_date_obj > today:
+            return "Cannot update habit with a future date.", None
         if name not in self.habits:
-            return f"Habit '{name}' does not exist."
-        if custom_date in self.habits[name].completion_dates:
-            return f"Habit '{name}' is already marked as completed on {custom_date}."
+            return f"Habit '{name}' does not exist.", None
+        if not self.habits[name].add_completion(custom_date_obj.toordinal()):
+            return f"Habit '{name}' is already marked as completed on {custom_date}.", None
+        if self._index is not None:
+            self._index.add(name, custom_date_obj.toordinal())
+        return f"Habit '{name}' marked as completed on {custom_date}.", {'op': 'complete', 'name': name, 'date': custom_date}
 
-        self.habits[name].completion_dates.append(custom_date)
-        self.save_habits()
-        return f"Habit '{name}' marked as completed on {custom_date}."
+    def _remove(self, name):
+        """
+        Validate and apply the removal of a habit in memory.
 
-    def remove_habit(self, name):
-        """Remove a habit from the tracker by name."""
+        :return: A tuple (message, mutation record or None if nothing changed).
+        """
         if name not in self.habits:
-            return f"Habit '{name}' does not exist."
+            return f"Habit '{name}' does not exist.", None
+        if self._index is not None:
+            self._index.remove_habit(name, self.habits[name].ordinals)
+        self.streak_cache.discard(name)
         del self.habits[name]
-        self.save_habits()
-        return f"Habit '{name}' correctly deleted."
+        return f"Habit '{name}' correctly deleted.", {'op': 'remove', 'name': name}
+
+    def _apply_operations(self, operations, on_result):
+        """
+        Validate and apply a stream of operations in memory one by one, then persist all the changes with a single write.
+
+        :param operations: An iterable of batch items (see apply_batch).
+        :param on_result: Function called with (message, applied) for every item.
+        """
+        today = datetime.today().date()
+        records = []
+        try:
+            for operation in operations:
+                try:
+                    record = normalize_operation(operation)
+                except (TypeError, ValueError):
+                    on_result(f"Malformed batch item: {operation!r}.", False)
+                    continue
+                op, name = record.get('op'), record.get('name')
+                if op == 'complete':
+                    message, applied = self._complete(name, record.get('date'), today)
+                elif op == 'add':
+                    message, applied = self._add(name, record.get('type', 'daily'), record.get('completion_dates', []),
+                                                 today)
+                elif op == 'remove':
+                    message, applied = self._remove(name)
+                elif op == 'invalid':
+                    # A row the reader could not decode
+                    message, applied = record.get('error'), None
+                else:
+                    message, applied = f"Unknown operation: {op}.", None
+                if applied is not None:
+                    records.append(applied)
+                on_result(message, applied is not None)
+        except BaseException:
+            # Reading the input failed half way (e.g. an I/O error): the items applied so far are already in memory,
+            # so they are persisted rather than left out of the file, then the error is raised
+            if records:
+                self._persist(*records)
+            raise
+        if records:
+            self._persist(*records)
+
+    @instrumented('apply_batch')
+    def apply_batch(self, operations, with_status=False):
+        """
+        Apply many completions, additions and removals as a unit: every item is validated and applied in a single pass
+        and the changes are persisted with one write. Invalid items, including malformed ones, are rejected with a
+        message and do not stop the batch. If iterating over the operations itself raises, the items applied before
+        the error are persisted and the error is propagated.
+
+        :param operations: An iterable of (habit name, date) completions and/or mutation records such as
+                           {'op': 'add', 'name': ..., 'type': ...} or {'op': 'remove', 'name': ...}.
+        :param with_status: If True, return (message, applied) tuples instead of bare messages.
+        :return: A list with one message per item, worded like the messages of the single-item methods.
+        """
+        results = []
+        if with_status:
+            self._apply_operations(operations, lambda message, applied: results.append((message, applied)))
+        else:
+            self._apply_operations(operations, lambda message, applied: results.append(message))
+        return results
+
+    @instrumented('import_file')
+    def import_file(self, file_path, max_messages=100):
+        """
+        Stream operations from a CSV or JSON-lines file into the tracker without loading the file in memory.
+
+        Undecodable lines are counted as rejected items. If reading the file fails half way, the items applied so far
+        are persisted and the error is propagated (see apply_batch).
+
+        :param file_path: Path of the file, see batch_import.read_operations for the accepted formats.
+        :param max_messages: Maximum number of rejection messages kept in the summary.
+        :return: A dictionary with the number of 'applied' and 'rejected' items and the first rejection 'messages'.
+        """
+        summary = {'applied': 0, 'rejected': 0, 'messages': []}
+
+        def count(message, applied):
+            if applied:
+                summary['applied'] += 1
+                return
+            summary['rejected'] += 1
+            if len(summary['messages']) < max_messages:
+                summary['messages'].append(message)
+
+        self._apply_operations(read_operations(file_path), count)
+        return summary
+
+    @classmethod
+    def fill_missing_dates_in_files(cls, json_file_paths, today=None):
+        """
+        Fill the missing completion dates of every habit in several data files in one call,
+        saving only the files that actually changed.
+
+        :param json_file_paths: The paths of the data files to backfill.
+        :param today: The date (datetime.date) to fill up to, defaults to today.
+        :return: A dictionary mapping each path to the result of fill_missing_dates for that file.
+        """
+        today = today or datetime.today().date()
+        results = {}
+        for json_file_path in json_file_paths:
+            tracker = cls(json_file_path)
+            results[json_file_path] = tracker.fill_missing_dates(today)
+            if results[json_file_path]:
+                tracker.save_habits()
+            tracker.close()
+        return results
 
+    @instrumented('longest_habit_streak')
     def longest_habit_streak(self):
         # Initialize variables to keep track of the habit name and length of longest streak
         longest_name = None
         longest_streak = 0
         # Iterate through all habits to find the longest streak
+        today = datetime.today().date()
         for name, habit in self.habits.items():
-            # Check the streak of the current habit
-            streak = habit.verify_streak()
+            # Check the streak of the current habit, served from the cache unless the habit changed
+            streak = self.streak_cache.current(habit, today)
             # If the current habit's streak is longer than the longest found so far, update the records
             if streak > longest_streak:
                 longest_name = name
@@ -96,42 +474,186 @@ class HabitTracker:
         # Return the name of the habit with the longest streak and the length of the streak
         return longest_name, longest_streak
 
+    @instrumented('streak_as_of')
+    def streak_as_of(self, name, day=None):
+        """
+        :param name: The name of the habit.
+        :param day: Any date (datetime.date), defaults to today.
+        :return: The streak the habit had on that day, counting only the completions up to that day or week,
+                 or None if the habit does not exist.
+        """
+        habit = self.habits.get(name)
+        if habit is None:
+            return None
+        if day is None:
+            return self.streak_cache.current(habit)
+        return self.streak_cache.as_of(habit, day)
+
+    @instrumented('streak_history')
+    def streak_history(self, name):
+        """
+        :param name: The name of the habit.
+        :return: A dictionary with the current streak, the longest streak ever and the list of streak segments as
+                 (first completion date, last completion date, length) tuples, or None if the habit does not exist.
+        """
+        habit = self.habits.get(name)
+        if habit is None:
+            return None
+        return {'current': self.streak_cache.current(habit), 'longest': self.streak_cache.longest(habit),
+                'segments': self.streak_cache.segments(habit)}
+
+    @instrumented('current_daily_habits')
     def current_daily_habits(self):
         # List comprehension iterates through all habits and picks only those with the 'daily' type
         return [name for name, habit in self.habits.items() if habit.habit_type == 'daily']
 
+    @instrumented('current_weekly_habits')
     def current_weekly_habits(self):
         # List comprehension iterates through all habits and picks only those with the 'daily' type
         return [name for name, habit in self.habits.items() if habit.habit_type == 'weekly']    
 
+    @instrumented('habits_most_struggled_last_month')
     def habits_most_struggled_last_month(self):
         # Get today's date
         today = datetime.today().date()
-        # Calculate the first day of last month
-        first_day_last_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-        # Calculate the last day of last month
+        # Calculate the last day of last month, which gives its year and month
         last_day_last_month = today.replace(day=1) - timedelta(days=1)
-        # Initialize a dictionary to keep track of each habit's struggle score
-        struggle_list = {}
-        # Iterate through all the habits
-        for name, habit in self.habits.items():
-            # Initialize the count of missed days for the current habit
-            missed_days = 0
-            # Check each completion date to see if it falls in the last month
-            for date_str in habit.completion_dates:
-                date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                if first_day_last_month <= date <= last_day_last_month:
-                    missed_days += 1
-            # Calculate the number of days in the last month
-            total_days_last_month = (last_day_last_month - first_day_last_month).days + 1
-            # Determine the number of possible occurrences based on habit type
-            if habit.habit_type == 'daily':
-                possible_occurrences = total_days_last_month
-            elif habit.habit_type == 'weekly':
-                possible_occurrences = total_days_last_month // 7
-            # Calculate the struggle score (potential minus actual completion)
-            struggle_score = possible_occurrences - missed_days
-            # Add the struggle score for the habit to the dictionary
-            struggle_list[name] = struggle_score
-        # Sort the struggle_list dictionary by struggle score (lowest to highest) and return the names of top 3 habits
-        return sorted(struggle_list, key=struggle_list.get, reverse = True)[:3]
\ No newline at end of file
+        return self.habits_most_struggled(last_day_last_month.year, last_day_last_month.month)
+
+    def _month_done(self, year, month):
+        """
+        :return: A dictionary mapping each daily and weekly habit to how many of the month's days or ISO weeks it
+                 was done, counted by the storage backend (an indexed query for SQLite, the rollups otherwise).
+        """
+        if self._pending:
+            # Mutations not written yet are only reflected by the in-memory rollups
+            return habits_month_done(self.habits, year, month)
+        return self.storage.month_done(self.habits, year, month)
+
+    @instrumented('habits_most_struggled')
+    def habits_most_struggled(self, year, month, top=3):
+        """
+        Rank the habits by how much they were struggled with in any month: possible occurrences minus what was done.
+
+        Daily habits can be done on every day of the month, weekly habits once in each ISO week whose Thursday falls
+        in the month. The counts come from the storage backend (see _month_done), so no completion date is read.
+
+        :param year: The year of the month.
+        :param month: The month (1-12).
+        :param top: The number of habits to return.
+        :return: The names of the habits with the highest struggle scores.
+        """
+        # Compute the struggle score of each tracked habit from its monthly or weekly count
+        struggle_list = {name: month_opportunities(self.habits[name].habit_type, year, month) - done
+                         for name, done in self._month_done(year, month).items()}
+        # Sort the struggle_list dictionary by struggle score (highest first) and return the names of the top habits
+        return sorted(struggle_list, key=struggle_list.get, reverse = True)[:top]
+
+    @instrumented('completion_trend')
+    def completion_trend(self, name, first_month, last_month):
+        """
+        Report how a habit went month by month over a range of months.
+
+        :param name: The name of the habit.
+        :param first_month: The first month as a (year, month) tuple.
+        :param last_month: The last month as a (year, month) tuple, included.
+        :return: A list of dictionaries with 'year', 'month', 'done', 'possible' and 'adherence' (a percentage),
+                 or None if the habit does not exist.
+        """
+        habit = self.habits.get(name)
+        if habit is None:
+            return None
+        rollup = habit.rollup
+        return [{'year': year, 'month': month,
+                 'done': month_done(habit.habit_type, rollup, year, month),
+                 'possible': month_opportunities(habit.habit_type, year, month),
+                 'adherence': adherence(habit.habit_type, rollup, year, month)}
+                for year, month in months_between(first_month, last_month)]
+
+    @instrumented('monthly_adherence')
+    def monthly_adherence(self, year, month):
+        """
+        :param year: The year of the month.
+        :param month: The month (1-12).
+        :return: A dictionary mapping each daily and weekly habit to the percentage of its possible occurrences
+                 it was done in the month.
+        """
+        return {name: 100.0 * done / month_opportunities(self.habits[name].habit_type, year, month)
+                for name, done in self._month_done(year, month).items()}
+
+    def completion_index(self):
+        """
+        Return the per-day inverted index of all completions, built on first use and then kept up to date by every
+        mutation of this tracker.
+        """
+        if self._index is None:
+            self._index = CompletionIndex(self.habits)
+        return self._index
+
+    @instrumented('habits_completed_between')
+    def habits_completed_between(self, first_day, last_day):
+        """
+        :param first_day: First date (datetime.date) of the range.
+        :param last_day: Last date (datetime.date) of the range, included.
+        :return: The sorted names of the habits completed at least once in the range.
+        """
+        return sorted(self.completion_index().habits_between(first_day.toordinal(), last_day.toordinal()))
+
+    @instrumented('completions_on')
+    def completions_on(self, day):
+        """
+        :param day: A date (datetime.date).
+        :return: The sorted names of the habits completed on that day.
+        """
+        return sorted(self.completion_index().habits_on(day.toordinal()))
+
+    @instrumented('empty_days')
+    def empty_days(self, first_day, last_day):
+        """
+        :param first_day: First date (datetime.date) of the range.
+        :param last_day: Last date (datetime.date) of the range, included.
+        :return: The dates (datetime.date) of the range on which no habit was completed.
+        """
+        return [date.fromordinal(ordinal)
+                for ordinal in self.completion_index().empty_days(first_day.toordinal(), last_day.toordinal())]
+
+    @instrumented('completion_heatmap')
+    def completion_heatmap(self, first_day, last_day):
+        """
+        :param first_day: First date (datetime.date) of the range.
+        :param last_day: Last date (datetime.date) of the range, included.
+        :return: A dictionary mapping every date (datetime.date) of the range with completions to the number of
+                 habits completed that day; days without completions are left out.
+        """
+        counts = self.completion_index().counts_between(first_day.toordinal(), last_day.toordinal())
+        return {date.fromordinal(ordinal): count for ordinal, count in counts.items()}
+
+    @instrumented('completion_rate')
+    def completion_rate(self, name, first_day, last_day):
+        """
+        Compute how consistently a habit was done over a date range, e.g. a quarter.
+
+        Daily habits are measured in days, weekly habits in Monday-based weeks touching the range.
+
+        :param name: The name of the habit.
+        :param first_day: First date (datetime.date) of the range.
+        :param last_day: Last date (datetime.date) of the range, included.
+        :return: The percentage (0-100) of the range's days or weeks with a completion, or None if the habit
+                 does not exist.
+        """
+        habit = self.habits.get(name)
+        if habit is None:
+            return None
+        first, last = first_day.toordinal(), last_day.toordinal()
+        if last < first:
+            return 0.0
+        ordinals = habit.ordinals
+        # The ordinals are sorted, so the range is located by two binary searches
+        start, end = bisect_left(ordinals, first), bisect_right(ordinals, last)
+        if habit.habit_type == 'weekly':
+            done = len({habit.unit_of(ordinal) for ordinal in ordinals[start:end]})
+            possible = habit.unit_of(last) - habit.unit_of(first) + 1
+        else:
+            done = end - start
+            possible = last - first + 1
+        return 100.0 * done / possible
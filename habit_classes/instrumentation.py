@@ -0,0 +1,173 @@
+import cProfile
+import functools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from habit_classes.persistence import atomic_write_json
+
+logger = logging.getLogger('habit_tracker')
+
+class Instrumentation:
+    """
+    Opt-in counters, latency histograms and on-demand profiling for HabitTracker and Habit.
+
+    Everything is disabled by default: instrumented functions then only pay for a single attribute check.
+    Enable it with metrics.enable() or by setting the HABIT_TRACKER_METRICS environment variable.
+    """
+
+    # Upper bounds, in seconds, of the latency histogram buckets
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._profile_requests = {}
+        self.reset()
+
+    def enable(self):
+        """Start recording."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording. Recorded figures are kept until reset()."""
+        self.enabled = False
+
+    def reset(self):
+        """Forget every recorded figure."""
+        with self._lock:
+            self.operations = {}
+            self.counters = {'bytes_written': 0, 'snapshot_writes': 0, 'journal_writes': 0, 'dates_parsed': 0}
+
+    def count(self, counter, amount=1):
+        """
+        Increase a counter, e.g. 'bytes_written' or 'dates_parsed'.
+
+        :param counter: The name of the counter.
+        :param amount: The amount to add.
+        """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record(self, operation, seconds):
+        """
+        Record the latency of one call of an operation.
+
+        :param operation: The name of the operation, e.g. 'load' or 'verify_streak'.
+        :param seconds: How long the call took.
+        """
+        with self._lock:
+            stats = self.operations.get(operation)
+            if stats is None:
+                stats = self.operations[operation] = {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                                                      'histogram': [0] * len(self.BUCKETS)}
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            bucket = 0
+            while seconds > self.BUCKETS[bucket]:
+                bucket += 1
+            stats['histogram'][bucket] += 1
+
+    def profile_next(self, operation, output_path, kind='cprofile'):
+        """
+        Capture a profile of the next call of an operation. Recording must be enabled.
+
+        :param operation: The name of the operation to profile.
+        :param output_path: Where to write the profile: cProfile stats (readable with pstats) or a text
+                            summary of the top allocations for tracemalloc.
+        :param kind: 'cprofile' or 'tracemalloc'.
+        """
+        if kind not in ('cprofile', 'tracemalloc'):
+            raise ValueError("kind must be 'cprofile' or 'tracemalloc'.")
+        with self._lock:
+            self._profile_requests[operation] = (output_path, kind)
+
+    def call(self, operation, function, args, kwargs):
+        """
+        Run a function, recording its latency and capturing a profile if one was requested for the operation.
+
+        :return: The return value of the function.
+        """
+        with self._lock:
+            request = self._profile_requests.pop(operation, None)
+        start = time.perf_counter()
+        try:
+            if request is None:
+                return function(*args, **kwargs)
+            return self._profile(request, function, args, kwargs)
+        finally:
+            self.record(operation, time.perf_counter() - start)
+
+    @staticmethod
+    def _profile(request, function, args, kwargs):
+        """Run a function under cProfile or tracemalloc and write the capture to the requested path."""
+        output_path, kind = request
+        if kind == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(function, *args, **kwargs)
+            finally:
+                profiler.dump_stats(output_path)
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if not already_tracing:
+                tracemalloc.stop()
+            with open(output_path, 'w') as f:
+                f.write(f"current={current} peak={peak}\n")
+                for statistic in snapshot.statistics('lineno')[:25]:
+                    f.write(f"{statistic}\n")
+
+    def debug(self, *values):
+        """Log a debugging message, only when recording is enabled."""
+        if self.enabled:
+            logger.debug(' '.join(str(value) for value in values))
+
+    def snapshot(self):
+        """
+        :return: A JSON-serializable copy of every recorded figure.
+        """
+        with self._lock:
+            operations = {}
+            for operation, stats in self.operations.items():
+                operations[operation] = dict(stats, mean_seconds=stats['total_seconds'] / stats['count'],
+                                             histogram=dict(zip(map(str, self.BUCKETS), stats['histogram'])))
+            counters = dict(self.counters)
+        writes = counters['snapshot_writes'] + counters['journal_writes']
+        counters['bytes_per_write'] = counters['bytes_written'] / writes if writes else 0
+        return {'operations': operations, 'counters': counters}
+
+    def export(self, output_path):
+        """
+        Write the recorded figures to a local JSON file.
+
+        :param output_path: The path of the file to write.
+        """
+        atomic_write_json(output_path, self.snapshot())
+
+# The process-wide instrumentation used by HabitTracker and Habit
+metrics = Instrumentation()
+if os.environ.get('HABIT_TRACKER_METRICS'):
+    metrics.enable()
+
+def instrumented(operation):
+    """
+    Decorator recording the calls of a function under an operation name when metrics are enabled.
+
+    :param operation: The name the calls are recorded under.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            return metrics.call(operation, function, args, kwargs)
+        return wrapper
+    return decorator
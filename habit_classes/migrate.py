@@ -0,0 +1,100 @@
+import argparse
+import os
+from habit_classes.storage import BinaryStorage, JSONStorage, SQLiteStorage, open_storage
+
+def copy_habits(source, target):
+    """
+    Copy every habit from one storage backend to another.
+
+    :param source: The StorageBackend to read from.
+    :param target: The StorageBackend to write to. Its previous content is replaced.
+    :return: The number of habits copied.
+    """
+    habits = source.load()
+    target.save(habits)
+    return len(habits)
+
+def migrate_json_to_sqlite(json_file_path, db_file_path=None):
+    """
+    Convert a JSON habit file into an SQLite database.
+
+    :param json_file_path: Path to the JSON file to convert.
+    :param db_file_path: Path of the database to create. Defaults to the JSON path with a .db extension.
+    :return: A tuple with the database path and the number of habits migrated.
+    """
+    if db_file_path is None:
+        db_file_path = os.path.splitext(json_file_path)[0] + '.db'
+    target = SQLiteStorage(db_file_path)
+    try:
+        count = copy_habits(JSONStorage(json_file_path), target)
+    finally:
+        target.close()
+    return db_file_path, count
+
+def convert_file(source_path, target_path):
+    """
+    Convert a habit file between the JSON, SQLite and binary formats, picked from the file extensions.
+
+    :param source_path: Path of the file to convert.
+    :param target_path: Path of the file to create.
+    :return: The number of habits converted.
+    """
+    source, target = open_storage(source_path), open_storage(target_path)
+    try:
+        return copy_habits(source, target)
+    finally:
+        source.close()
+        target.close()
+
+def json_to_binary(json_file_path, binary_file_path=None):
+    """
+    Convert a JSON habit file into a binary snapshot.
+
+    :param json_file_path: Path to the JSON file to convert.
+    :param binary_file_path: Path of the snapshot to create. Defaults to the JSON path with a .hbt extension.
+    :return: A tuple with the snapshot path and the number of habits converted.
+    """
+    if binary_file_path is None:
+        binary_file_path = os.path.splitext(json_file_path)[0] + '.hbt'
+    return binary_file_path, copy_habits(JSONStorage(json_file_path), BinaryStorage(binary_file_path))
+
+def binary_to_json(binary_file_path, json_file_path=None):
+    """
+    Convert a binary snapshot back into a JSON habit file in the usual schema.
+
+    :param binary_file_path: Path to the snapshot to convert.
+    :param json_file_path: Path of the JSON file to create. Defaults to the snapshot path with a .json extension.
+    :return: A tuple with the JSON path and the number of habits converted.
+    """
+    if json_file_path is None:
+        json_file_path = os.path.splitext(binary_file_path)[0] + '.json'
+    source = BinaryStorage(binary_file_path)
+    try:
+        count = copy_habits(source, JSONStorage(json_file_path))
+    finally:
+        source.close()
+    return json_file_path, count
+
+# Target formats of the command line, with the extension of the files they create
+FORMATS = {'sqlite': '.db', 'binary': '.hbt', 'json': '.json'}
+
+def main(argv=None):
+    """Command line entry point: python -m habit_classes.migrate data/*.json [--format binary]"""
+    parser = argparse.ArgumentParser(description="Convert habit files between the JSON, SQLite and binary formats.")
+    parser.add_argument('json_files', nargs='+', help="Habit files to convert (JSON, or .db/.hbt with --format json).")
+    parser.add_argument('--output-dir', help="Directory for the converted files. Defaults to the directory of each file.")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='sqlite', help="Format to convert to.")
+    args = parser.parse_args(argv)
+
+    for source_path in args.json_files:
+        target_path = os.path.splitext(source_path)[0] + FORMATS[args.format]
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            target_path = os.path.join(args.output_dir, os.path.basename(target_path))
+        if os.path.abspath(target_path) == os.path.abspath(source_path):
+            parser.error(f"'{source_path}' is already in the {args.format} format.")
+        count = convert_file(source_path, target_path)
+        print(f"Migrated {count} habits from '{source_path}' to '{target_path}'.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import functools
+import heapq
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from habit_classes.habit_tracker import HabitTracker
+from habit_classes.storage import BINARY_EXTENSIONS, SQLITE_EXTENSIONS
+
+# Extensions of the habit files collected from directories
+DATA_EXTENSIONS = ('.json',) + SQLITE_EXTENSIONS + BINARY_EXTENSIONS
+
+def summarize_file(file_path, today_ordinal, year, month, top):
+    """
+    Load one habit file and reduce it to a compact, picklable summary. Runs in a worker process.
+
+    :param file_path: Path of the habit file.
+    :param today_ordinal: Day ordinal streaks are computed for, the same in every worker.
+    :param year: Year of the month of the struggle ranking.
+    :param month: Month (1-12) of the struggle ranking.
+    :param top: Number of best current streaks kept for the leaderboard.
+    :return: A dictionary with the counts of habits, the best current streaks as (streak, file, habit) tuples,
+             the histogram of current streaks per habit type, the longest streak and the struggled habits of the file,
+             or with an 'error' message if the file could not be read or is malformed.
+    """
+    try:
+        tracker = HabitTracker(file_path, autosave=False)
+    except Exception as error:
+        # Any failure, including a readable file with the wrong structure, is reported for this file only
+        return {'path': file_path, 'error': f"{type(error).__name__}: {error}"}
+    try:
+        today = date.fromordinal(today_ordinal)
+        # Every current streak of the file in one pass of the (vectorized when possible) analytics engine
+        current_streaks = tracker.analytics().current_streaks(today)
+        streaks = {'daily': Counter(), 'weekly': Counter()}
+        best = []
+        longest = (None, 0)
+        for name, habit in tracker.habits.items():
+            if habit.habit_type not in streaks:
+                continue
+            streak = current_streaks[name]
+            streaks[habit.habit_type][streak] += 1
+            best.append((streak, file_path, name))
+            if streak > longest[1]:
+                longest = (name, streak)
+        return {'path': file_path, 'error': None, 'habits': len(tracker.habits),
+                'best': heapq.nlargest(top, best), 'streaks': {kind: dict(counts) for kind, counts in streaks.items()},
+                'longest': longest, 'struggled': tracker.habits_most_struggled(year, month)}
+    except Exception as error:
+        # Lazily loaded histories are only read here, so malformed ones surface here too
+        return {'path': file_path, 'error': f"{type(error).__name__}: {error}"}
+    finally:
+        tracker.close()
+
+def collect_files(paths):
+    """
+    :param paths: Habit files and directories; directories are searched recursively for habit files.
+    :return: A sorted list of habit file paths.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                files.extend(os.path.join(directory, name) for name in names
+                             if os.path.splitext(name)[1].lower() in DATA_EXTENSIONS)
+        else:
+            files.append(path)
+    return sorted(files)
+
+def merge_summaries(summaries, top=10):
+    """
+    Merge per-file summaries into global leaderboards and distributions.
+
+    :param summaries: An iterable of summaries returned by summarize_file.
+    :param top: Number of entries kept in each leaderboard.
+    :return: The report dictionary.
+    """
+    report = {'files': 0, 'habits': 0, 'errors': [], 'leaderboard': [], 'longest_per_file': [],
+              'streak_distribution': {'daily': Counter(), 'weekly': Counter()}, 'most_struggled': Counter()}
+    best = []
+    longest = []
+    for summary in summaries:
+        report['files'] += 1
+        if summary['error'] is not None:
+            report['errors'].append({'path': summary['path'], 'error': summary['error']})
+            continue
+        report['habits'] += summary['habits']
+        # Each file already sent only its own top entries, so the global top is among them
+        best = heapq.nlargest(top, best + summary['best'])
+        if summary['longest'][0] is not None:
+            longest = heapq.nlargest(top, longest + [(summary['longest'][1], summary['path'], summary['longest'][0])])
+        for kind, counts in summary['streaks'].items():
+            report['streak_distribution'][kind].update(counts)
+        report['most_struggled'].update(summary['struggled'])
+    report['leaderboard'] = [{'path': path, 'habit': name, 'streak': streak} for streak, path, name in best]
+    report['longest_per_file'] = [{'path': path, 'habit': name, 'streak': streak} for streak, path, name in longest]
+    report['streak_distribution'] = {kind: dict(sorted(counts.items()))
+                                     for kind, counts in report['streak_distribution'].items()}
+    report['most_struggled'] = [{'habit': name, 'files': count} for name, count in report['most_struggled'].most_common(top)]
+    return report
+
+def analyze_files(paths, workers=None, chunksize=1, top=10, today=None, year=None, month=None):
+    """
+    Compute streak leaderboards, streak distributions and struggled habits across many habit files in parallel.
+
+    Every file is loaded and analysed in a worker process, which sends back only a compact summary; the parent
+    just merges them, so the work scales with the number of cores.
+
+    :param paths: Habit files and/or directories to search for habit files.
+    :param workers: Number of worker processes, defaults to the number of cores. 1 runs everything in this process.
+    :param chunksize: Number of files handed to a worker at a time; larger chunks cut inter-process overhead
+                      when there are many small files.
+    :param top: Number of entries kept in each leaderboard.
+    :param today: The reference date (datetime.date) of the current streaks, defaults to today.
+    :param year: Year of the struggle ranking, defaults to last month's.
+    :param month: Month of the struggle ranking, defaults to last month.
+    :return: The report dictionary (see merge_summaries).
+    """
+    today = today or datetime.today().date()
+    if year is None or month is None:
+        last_month = today.replace(day=1) - timedelta(days=1)
+        year, month = last_month.year, last_month.month
+    files = collect_files(paths)
+    summarize = functools.partial(summarize_file, today_ordinal=today.toordinal(), year=year, month=month, top=top)
+    if workers == 1:
+        return merge_summaries(map(summarize, files), top)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return merge_summaries(executor.map(summarize, files, chunksize=chunksize), top)
+
+def main(argv=None):
+    """Command line entry point: python -m habit_classes.multi_file_analytics data/profiles --workers 8"""
+    parser = argparse.ArgumentParser(description="Aggregate habit statistics across many habit files in parallel.")
+    parser.add_argument('paths', nargs='+', help="Habit files, or directories searched for .json/.db/.hbt files.")
+    parser.add_argument('--workers', type=int, help="Worker processes, defaults to the number of cores.")
+    parser.add_argument('--chunksize', type=int, default=1, help="Files handed to a worker at a time.")
+    parser.add_argument('--top', type=int, default=10, help="Entries per leaderboard.")
+    parser.add_argument('--month', help="Month of the struggle ranking as YYYY-MM, defaults to last month.")
+    parser.add_argument('--output', help="Path of a JSON file for the full report.")
+    args = parser.parse_args(argv)
+
+    year = month = None
+    if args.month:
+        parsed = datetime.strptime(args.month, '%Y-%m')
+        year, month = parsed.year, parsed.month
+    report = analyze_files(args.paths, args.workers, args.chunksize, args.top, year=year, month=month)
+    print(f"{report['files']} files, {report['habits']} habits, {len(report['errors'])} unreadable files.")
+    print("Longest current streaks:")
+    for entry in report['leaderboard']:
+        print(f"  {entry['streak']:>6}  {entry['habit']}  ({entry['path']})")
+    print("Most struggled habits:")
+    for entry in report['most_struggled']:
+        print(f"  {entry['files']:>6}  {entry['habit']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import json
+import os
+import tempfile
+
+def file_signature(file_path):
+    """
+    A cheap fingerprint of a file for change detection: a single stat call, no reading.
+
+    The inode catches files replaced atomically by another writer, the size and nanosecond mtime catch in-place edits.
+
+    :param file_path: The path of the file.
+    :return: A tuple (inode, size, mtime in nanoseconds), or None if the file does not exist.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+def atomic_write(file_path, writer, mode='wb', suffix=''):
+    """
+    Write a file atomically through a writer callback.
+
+    The callback writes to a temporary file in the same directory, which is flushed to disk and then renamed over
+    the destination, so readers either see the old file or the new one, never a half-written file.
+
+    :param file_path: Destination path.
+    :param writer: Function called with the open temporary file; what it returns is returned.
+    :param mode: 'wb' to write bytes, 'w' to write text.
+    :param suffix: Suffix of the temporary file name, e.g. the destination's extension.
+    :return: The result of writer.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            result = writer(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        # Never leave a stray temporary file behind if the write failed half way
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return result
+
+def atomic_write_json(file_path, data, indent=4):
+    """
+    Write data as JSON to file_path atomically (see atomic_write).
+
+    :param file_path: Destination path of the JSON file.
+    :param data: The JSON-serializable object to write.
+    :param indent: Indentation passed to json.dump.
+    :return: The number of bytes written.
+    """
+    def write(f):
+        json.dump(data, f, indent=indent)
+        return f.tell()
+
+    return atomic_write(file_path, write, mode='w', suffix='.json')
+
+def format_dates_array(completion_dates):
+    """
+    Format a list of date strings exactly like json.dump(..., indent=4) lays out a habit's completion_dates.
+
+    :param completion_dates: The date strings.
+    :return: The JSON text of the array.
+    """
+    if not completion_dates:
+        return '[]'
+    return '[\n            ' + ',\n            '.join(json.dumps(d) for d in completion_dates) + '\n        ]'
+
+def write_indexed_snapshot(file_path, entries):
+    """
+    Write habits atomically (see atomic_write) as JSON, with the same layout as json.dump(..., indent=4), and
+    record where the completion_dates array of each habit starts and ends in the file.
+
+    :param file_path: Destination path of the JSON file.
+    :param entries: An iterable of (name, habit type, JSON text of the completion_dates array) tuples.
+    :return: A tuple (number of bytes written, list of (name, habit type, start offset, end offset)).
+    """
+    def write(f):
+        spans = []
+        offset = f.write(b'{')
+        for index, (name, habit_type, array_text) in enumerate(entries):
+            head = (',' if index else '') + '\n    ' + json.dumps(name) + ': {\n        "type": ' + \
+                json.dumps(habit_type) + ',\n        "completion_dates": '
+            offset += f.write(head.encode('utf-8'))
+            start = offset
+            offset += f.write(array_text.encode('utf-8'))
+            spans.append((name, habit_type, start, offset))
+            offset += f.write(b'\n    }')
+        offset += f.write(b'\n}' if spans else b'}')
+        return offset, spans
+
+    return atomic_write(file_path, write, suffix='.json')
+
+class SnapshotVersion:
+    """
+    One version of a JSON snapshot written by write_indexed_snapshot, identified by its file signature.
+    It is shared by the slices pointing into that version.
+    """
+
+    __slots__ = ('file_path', 'signature', '_current')
+
+    def __init__(self, file_path, signature):
+        """
+        :param file_path: The path of the snapshot.
+        :param signature: The file_signature of the snapshot when its index was written or read.
+        """
+        self.file_path = file_path
+        self.signature = signature
+        self._current = None
+
+    def is_current(self):
+        """
+        :return: False once another writer has changed the file, which moves every habit's byte span.
+        """
+        return file_signature(self.file_path) == self.signature
+
+    def current_dates(self, name):
+        """
+        Fallback for a file changed by another writer: the completion dates of a habit as the file stores them now.
+        The file is parsed once for all the slices of this version.
+
+        :param name: The name of the habit.
+        :return: The list of date strings, empty if the habit is no longer in the file.
+        """
+        if self._current is None:
+            with open(self.file_path, 'r') as f:
+                data = json.load(f)
+            self._current = {habit: info['completion_dates'] for habit, info in data.items()}
+        return self._current.get(name, [])
+
+class SnapshotSlice:
+    """
+    The location of one habit's completion_dates array inside a JSON snapshot written by write_indexed_snapshot.
+    Calling it parses just that array.
+
+    If another writer has changed the file since, the span is meaningless: the habit's current dates are then
+    read from the whole file instead.
+    """
+
+    __slots__ = ('version', 'name', 'start', 'end', 'checksum')
+
+    def __init__(self, version, name, start, end, checksum=None):
+        """
+        :param version: The SnapshotVersion the byte span refers to.
+        :param name: The name of the habit.
+        :param start: Offset of the first byte of the array.
+        :param end: Offset just after the array.
+        :param checksum: The CRC-32 of the array's bytes, used to detect external changes without reading them.
+        """
+        self.version = version
+        self.name = name
+        self.start = start
+        self.end = end
+        self.checksum = checksum
+
+    def read_text(self):
+        """
+        :return: The JSON text of the array, unparsed.
+        """
+        if not self.version.is_current():
+            return format_dates_array(self.version.current_dates(self.name))
+        with open(self.version.file_path, 'rb') as f:
+            f.seek(self.start)
+            return f.read(self.end - self.start).decode('utf-8')
+
+    def __call__(self):
+        """
+        :return: The list of date strings.
+        """
+        if not self.version.is_current():
+            return self.version.current_dates(self.name)
+        return json.loads(self.read_text())
+
+class HabitJournal:
+    """
+    An append-only log of habit mutations kept next to the JSON snapshot.
+
+    Every mutation is written as a single JSON object on its own line. Replaying the journal on top of the
+    snapshot gives the current state; compaction folds it back into the snapshot and empties the log.
+    """
+
+    def __init__(self, journal_path):
+        """
+        Initializes the journal for the given path. The file is created lazily on the first append.
+
+        :param journal_path: Path of the journal file.
+        """
+        self.journal_path = journal_path
+        self.record_count = 0
+
+    def append(self, records):
+        """
+        Append one or more records to the journal and make them durable.
+
+        :param records: A list of JSON-serializable dictionaries.
+        :return: The number of bytes written.
+        """
+        if not records:
+            return 0
+        payload = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        with open(self.journal_path, 'a') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.record_count += len(records)
+        return len(payload)
+
+    def replay(self):
+        """
+        Read back all complete records from the journal.
+
+        A torn last record (missing its newline or not valid JSON, e.g. after a crash during a write) and
+        anything after it is ignored, and the file is truncated back to the last good record so that later
+        appends start on a clean line.
+
+        :return: A list of the recorded dictionaries, in the order they were written.
+        """
+        records = []
+        if not os.path.isfile(self.journal_path):
+            self.record_count = 0
+            return records
+        good_offset = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good_offset += len(line)
+        if good_offset != os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_offset)
+        self.record_count = len(records)
+        return records
+
+    def truncate(self):
+        """Empty the journal after its records have been folded into the snapshot."""
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.record_count = 0
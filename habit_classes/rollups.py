@@ -0,0 +1,194 @@
+import calendar
+from datetime import date
+
+def month_key(year, month):
+    """
+    :return: The number of a calendar month counted from year 0, used as rollup key.
+    """
+    return year * 12 + month - 1
+
+def month_of_key(key):
+    """
+    :return: The (year, month) tuple of a month key.
+    """
+    return key // 12, key % 12 + 1
+
+def week_of(ordinal):
+    """
+    Map a day ordinal to its Monday-based week number, the key of the weekly rollup.
+
+    ISO weeks also run from Monday to Sunday, so each week number is exactly one ISO week.
+
+    :param ordinal: The day ordinal.
+    :return: The week number.
+    """
+    return (ordinal - 1) // 7
+
+def month_weeks(year, month):
+    """
+    The ISO weeks belonging to a month: the weeks whose Thursday falls in it, as ISO 8601 assigns weeks to years.
+    Every week belongs to exactly one month this way, and a month has 4 or 5 of them.
+
+    :param year: The year of the month.
+    :param month: The month (1-12).
+    :return: A range of week numbers.
+    """
+    first = date(year, month, 1).toordinal()
+    last = first + calendar.monthrange(year, month)[1] - 1
+    # The Thursday of week w is ordinal 7 * w + 4
+    return range((first + 2) // 7, (last - 4) // 7 + 1)
+
+def month_opportunities(habit_type, year, month):
+    """
+    :return: How many times a habit of the given type can be completed in a month: its days or its ISO weeks.
+    """
+    if habit_type == 'weekly':
+        return len(month_weeks(year, month))
+    return calendar.monthrange(year, month)[1]
+
+class CompletionRollup:
+    """
+    Completion counts of one habit per calendar month and per ISO week.
+
+    Both tables are small dictionaries (a few dozen entries per year of history) updated in O(1) per completion,
+    so monthly reports never need to go through the completion dates themselves.
+    """
+
+    __slots__ = ('months', 'weeks')
+
+    def __init__(self, months=None, weeks=None):
+        """
+        :param months: A dictionary mapping month keys to completion counts.
+        :param weeks: A dictionary mapping week numbers to completion counts.
+        """
+        self.months = months if months is not None else {}
+        self.weeks = weeks if weeks is not None else {}
+
+    @classmethod
+    def from_ordinals(cls, ordinals):
+        """
+        Build the rollup of a sorted sequence of day ordinals in a single pass.
+
+        :param ordinals: The sorted day ordinals.
+        :return: The new CompletionRollup.
+        """
+        rollup = cls()
+        months, weeks = rollup.months, rollup.weeks
+        month_end = key = None
+        for ordinal in ordinals:
+            if month_end is None or ordinal > month_end:
+                # Only the first completion of each month needs a calendar lookup
+                day = date.fromordinal(ordinal)
+                key = month_key(day.year, day.month)
+                month_end = ordinal + calendar.monthrange(day.year, day.month)[1] - day.day
+                months[key] = 0
+            months[key] += 1
+            week = week_of(ordinal)
+            weeks[week] = weeks.get(week, 0) + 1
+        return rollup
+
+    def add(self, ordinal):
+        """Count one completion."""
+        day = date.fromordinal(ordinal)
+        key = month_key(day.year, day.month)
+        self.months[key] = self.months.get(key, 0) + 1
+        week = week_of(ordinal)
+        self.weeks[week] = self.weeks.get(week, 0) + 1
+
+    def add_range(self, first, last):
+        """
+        Count one completion on every day from first to last, both included, in O(months + weeks).
+
+        :param first: The first day ordinal.
+        :param last: The last day ordinal.
+        """
+        ordinal = first
+        while ordinal <= last:
+            day = date.fromordinal(ordinal)
+            end = min(last, ordinal + calendar.monthrange(day.year, day.month)[1] - day.day)
+            key = month_key(day.year, day.month)
+            self.months[key] = self.months.get(key, 0) + end - ordinal + 1
+            ordinal = end + 1
+        ordinal = first
+        while ordinal <= last:
+            week = week_of(ordinal)
+            end = min(last, week * 7 + 7)
+            self.weeks[week] = self.weeks.get(week, 0) + end - ordinal + 1
+            ordinal = end + 1
+
+    def month_count(self, year, month):
+        """
+        :return: The number of completions in a month.
+        """
+        return self.months.get(month_key(year, month), 0)
+
+    def weeks_done(self, year, month):
+        """
+        :return: The number of the month's ISO weeks with at least one completion.
+        """
+        return sum(1 for week in month_weeks(year, month) if week in self.weeks)
+
+    def to_json(self):
+        """
+        :return: A JSON-serializable dictionary (JSON object keys are strings).
+        """
+        return {'months': {str(key): count for key, count in self.months.items()},
+                'weeks': {str(key): count for key, count in self.weeks.items()}}
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        :param data: A dictionary produced by to_json().
+        :return: The CompletionRollup.
+        """
+        return cls({int(key): count for key, count in data['months'].items()},
+                   {int(key): count for key, count in data['weeks'].items()})
+
+def month_done(habit_type, rollup, year, month):
+    """
+    :return: How many of a month's opportunities a habit used: completed days, or ISO weeks with a completion.
+    """
+    if habit_type == 'weekly':
+        return rollup.weeks_done(year, month)
+    return rollup.month_count(year, month)
+
+def habits_month_done(habits, year, month):
+    """
+    Count month_done for every daily and weekly habit from the in-memory rollups.
+
+    :param habits: A dictionary mapping habit names to Habit objects.
+    :param year: The year of the month.
+    :param month: The month (1-12).
+    :return: A dictionary mapping every daily and weekly habit name to its count.
+    """
+    return {name: month_done(habit.habit_type, habit.rollup, year, month)
+            for name, habit in habits.items() if habit.habit_type in ('daily', 'weekly')}
+
+def struggle_score(habit_type, rollup, year, month):
+    """
+    Score how much a habit was struggled with in a month: its opportunities minus what was done.
+
+    Daily habits can be done on every day of the month, weekly habits once in each of the month's ISO weeks;
+    several completions in the same week count once.
+
+    :param habit_type: 'daily' or 'weekly'.
+    :param rollup: The habit's CompletionRollup.
+    :param year: The year of the month.
+    :param month: The month (1-12).
+    :return: The struggle score.
+    """
+    return month_opportunities(habit_type, year, month) - month_done(habit_type, rollup, year, month)
+
+def adherence(habit_type, rollup, year, month):
+    """
+    :return: The percentage (0-100) of a month's opportunities a habit used.
+    """
+    return 100.0 * month_done(habit_type, rollup, year, month) / month_opportunities(habit_type, year, month)
+
+def months_between(first, last):
+    """
+    :param first: The first month as a (year, month) tuple.
+    :param last: The last month as a (year, month) tuple, included.
+    :return: A list of (year, month) tuples.
+    """
+    return [month_of_key(key) for key in range(month_key(*first), month_key(*last) + 1)]
@@ -0,0 +1,606 @@
+import calendar
+import json
+import os
+import sqlite3
+import zlib
+from datetime import date
+from habit_classes.binary_snapshot import BinarySnapshot, write_binary_snapshot
+from habit_classes.habit import Habit
+from habit_classes.instrumentation import metrics
+from habit_classes.persistence import (HabitJournal, SnapshotSlice, SnapshotVersion, atomic_write_json,
+                                       file_signature, format_dates_array, write_indexed_snapshot)
+from habit_classes.rollups import CompletionRollup, habits_month_done, month_weeks
+
+class StorageBackend:
+    """
+    Interface between a HabitTracker and the place its habits are persisted.
+
+    Mutations are handed over as small records (dictionaries with an 'op' key: 'add', 'complete', 'fill' for a range
+    of days from 'first' to 'last', or 'remove') after they have been applied in memory, so a backend can persist
+    them incrementally instead of rewriting everything.
+    """
+
+    def load(self):
+        """
+        Load all habits.
+
+        :return: A dictionary mapping habit names to Habit objects.
+        """
+        raise NotImplementedError
+
+    def save(self, habits):
+        """
+        Persist the complete state of the given habits, replacing whatever was stored before.
+
+        :param habits: A dictionary mapping habit names to Habit objects.
+        """
+        raise NotImplementedError
+
+    def apply(self, records, habits):
+        """
+        Persist mutations that have already been applied to habits in memory.
+
+        The default implementation simply rewrites the full state; backends that can do better override it.
+
+        :param records: A list of mutation records.
+        :param habits: The in-memory habits after the mutations were applied.
+        """
+        self.save(habits)
+
+    def compact(self, habits):
+        """Fold any incremental state into the main store. Does nothing by default."""
+
+    def signature(self):
+        """
+        Return a cheap fingerprint of the stored state that changes whenever another process modifies it.
+
+        :return: A comparable value, or None when the backend cannot detect external changes (the default).
+        """
+        return None
+
+    def checksum(self, habit):
+        """
+        A checksum of a habit's completion history in the form this backend stores it. The default is the CRC-32
+        of the ordinals array.
+        """
+        return zlib.crc32(habit.ordinals)
+
+    def fingerprint(self, habit):
+        """
+        :param habit: An in-memory Habit.
+        :return: A tuple (habit type, checksum), memoized until the habit changes or is replaced.
+        """
+        entry = self._fingerprints.get(habit.name)
+        if entry is not None and entry[0] is habit and entry[1] == habit.version:
+            return entry[2]
+        fingerprint = (habit.habit_type, self.checksum(habit))
+        self._fingerprints[habit.name] = (habit, habit.version, fingerprint)
+        return fingerprint
+
+    def reload(self, habits):
+        """
+        Read the stored state again after another process changed it, without any side effect on storage, and build
+        Habit objects only for the habits whose stored data differs from the in-memory ones.
+
+        The default implementation loads everything and compares fingerprints.
+
+        :param habits: The in-memory habits.
+        :return: A dictionary mapping every stored habit name to a new Habit when its stored type or history differs
+                 from the in-memory habit (or the habit is not in memory), or to None when it is unchanged.
+        """
+        stored = {}
+        for name, theirs in self.load().items():
+            ours = habits.get(name)
+            same = ours is not None and self.fingerprint(ours) == (theirs.habit_type, self.checksum(theirs))
+            stored[name] = None if same else theirs
+        return stored
+
+    def month_done(self, habits, year, month):
+        """
+        Count how many of a month's opportunities each daily and weekly habit used: completed days, or ISO weeks
+        with a completion (see rollups.month_done).
+
+        The default implementation reads each habit's rollup (see rollups.habits_month_done), which the lazy JSON
+        index persists.
+
+        :param habits: The in-memory habits, as stored.
+        :param year: The year of the month.
+        :param month: The month (1-12).
+        :return: A dictionary mapping every daily and weekly habit name to its count.
+        """
+        return habits_month_done(habits, year, month)
+
+    def close(self):
+        """Release any resource held by the backend."""
+
+class SnapshotStorage(StorageBackend):
+    """
+    Base class for backends keeping all habits in one snapshot file, optionally with an append-only journal next to it.
+
+    Subclasses implement load_snapshot() and write_snapshot().
+    """
+
+    def __init__(self, file_path, journal=False, compact_threshold=1000):
+        """
+        :param file_path: Path to the snapshot holding the habits.
+        :param journal: If True, mutations are appended to a journal next to the snapshot instead of rewriting it.
+        :param compact_threshold: Number of journal records after which the journal is folded into the snapshot.
+        """
+        self.snapshot_path = file_path
+        self.journal = HabitJournal(os.fspath(file_path) + '.journal') if journal else None
+        self.compact_threshold = compact_threshold
+        # Memoized (habit, version, fingerprint) per habit name, see fingerprint()
+        self._fingerprints = {}
+
+    def load_snapshot(self):
+        """
+        :return: A dictionary mapping habit names to Habit objects as stored in the snapshot.
+        """
+        raise NotImplementedError
+
+    def scan_snapshot(self):
+        """
+        Read what the snapshot stores now without building any Habit.
+
+        :return: A dictionary mapping habit names to (habit type, checksum, loader, rollup or None) tuples, where
+                 the loader returns the habit's history as Habit.lazy expects it.
+        """
+        raise NotImplementedError
+
+    def write_snapshot(self, habits):
+        """
+        Write the snapshot.
+
+        :return: The number of bytes written.
+        """
+        raise NotImplementedError
+
+    def load(self):
+        """Load habits from the snapshot and replay the journal on top of it, if enabled."""
+        habits = self.load_snapshot()
+        if self.journal is not None:
+            for record in self.journal.replay():
+                apply_record(habits, record)
+        return habits
+
+    def save(self, habits):
+        """Write a new snapshot atomically and fold the journal into it."""
+        size = self.write_snapshot(habits)
+        if metrics.enabled:
+            metrics.count('snapshot_writes')
+            metrics.count('bytes_written', size)
+        if self.journal is not None:
+            self.journal.truncate()
+
+    def apply(self, records, habits):
+        """Append the records to the journal, or rewrite the snapshot when the journal is disabled."""
+        if self.journal is None:
+            self.save(habits)
+            return
+        size = self.journal.append(records)
+        if metrics.enabled:
+            metrics.count('journal_writes')
+            metrics.count('bytes_written', size)
+        if self.journal.record_count >= self.compact_threshold:
+            self.compact(habits)
+
+    def compact(self, habits):
+        """Fold the journal back into the snapshot."""
+        self.save(habits)
+
+    def reload(self, habits):
+        """
+        Compare the snapshot and the journal with the in-memory habits through per-habit checksums. Only habits whose
+        stored data differs are built, lazily; unchanged habits not loaded yet are pointed at the new snapshot.
+        """
+        records = self.journal.replay() if self.journal is not None else []
+        journaled = {record.get('name') for record in records}
+        stored = {}
+        for name, (habit_type, checksum, loader, rollup) in self.scan_snapshot().items():
+            ours = habits.get(name)
+            if name not in journaled and ours is not None and self.fingerprint(ours) == (habit_type, checksum):
+                # Same data at a new place: the old one may be gone
+                ours.repoint(loader)
+                stored[name] = None
+            else:
+                stored[name] = Habit.lazy(name, habit_type, loader, rollup)
+        if records:
+            # Habits named in the journal are compared after replaying it on top of their snapshot version
+            built = {name: habit for name, habit in stored.items() if habit is not None}
+            for record in records:
+                apply_record(built, record)
+            for name in journaled:
+                stored.pop(name, None)
+                theirs, ours = built.get(name), habits.get(name)
+                if theirs is not None:
+                    same = ours is not None and self.fingerprint(ours) == (theirs.habit_type, self.checksum(theirs))
+                    stored[name] = None if same else theirs
+        self._fingerprints = {name: entry for name, entry in self._fingerprints.items() if name in stored}
+        return stored
+
+    def signature(self):
+        """The inode, size and mtime of the snapshot and of the journal."""
+        journal = file_signature(self.journal.journal_path) if self.journal is not None else None
+        return file_signature(self.snapshot_path), journal
+
+class JSONStorage(SnapshotStorage):
+    """
+    Stores the habits in a single JSON file, optionally with an append-only journal next to it.
+
+    In lazy mode a sidecar index (<file>.index) records the name, type and byte span of each habit's completion dates
+    in the snapshot, plus its checksum and its monthly and weekly rollups. Startup then reads only the index and each
+    habit's history is parsed the first time it is touched.
+    """
+
+    INDEX_VERSION = 3
+
+    def __init__(self, json_file_path, journal=False, compact_threshold=1000, lazy=False):
+        """
+        :param json_file_path: Path to the JSON snapshot holding the habits.
+        :param journal: If True, mutations are appended to a journal next to the JSON file instead of rewriting it.
+        :param compact_threshold: Number of journal records after which the journal is folded into the snapshot.
+        :param lazy: If True, load only the sidecar index on startup and parse completion histories on demand.
+        """
+        super().__init__(json_file_path, journal, compact_threshold)
+        self.json_file_path = json_file_path
+        self.lazy = lazy
+        self.index_path = os.fspath(json_file_path) + '.index'
+
+    def load(self):
+        """Load habits from the JSON file (or its index in lazy mode) and replay the journal on top of it, if enabled."""
+        habits = self._load_index() if self.lazy else None
+        if habits is not None:
+            if self.journal is not None:
+                for record in self.journal.replay():
+                    apply_record(habits, record)
+            return habits
+        habits = super().load()
+        if self.lazy and os.path.isfile(self.json_file_path) and os.path.getsize(self.json_file_path) > 0:
+            # The index is missing or stale: write a fresh snapshot with its index so the next startup is lazy
+            self.save(habits)
+        return habits
+
+    def load_snapshot(self):
+        """Parse the whole JSON file."""
+        if not os.path.isfile(self.json_file_path) or os.path.getsize(self.json_file_path) == 0:
+            return {}
+        with open(self.json_file_path, 'r') as f:
+            data = json.load(f)
+        return {name: Habit(name, info['type'], info['completion_dates']) for name, info in data.items()}
+
+    def checksum(self, habit):
+        """The CRC-32 of the habit's completion_dates array as written in the snapshot."""
+        if isinstance(habit.lazy_source, SnapshotSlice):
+            return habit.lazy_source.checksum
+        return zlib.crc32(format_dates_array(list(habit.completion_dates)).encode('utf-8'))
+
+    def scan_snapshot(self):
+        """
+        Read the checksums and byte spans from the sidecar index when it matches the snapshot, whoever wrote it, so
+        no history is parsed. Otherwise parse the JSON file once and checksum each history.
+        """
+        index = self._read_index()
+        if index is not None:
+            version = SnapshotVersion(self.json_file_path, file_signature(self.json_file_path))
+            return {name: (habit_type, index['checksums'][name],
+                           SnapshotSlice(version, name, start, end, index['checksums'][name]),
+                           CompletionRollup.from_json(index['rollups'][name]))
+                    for name, habit_type, start, end in index['habits']}
+        if not os.path.isfile(self.json_file_path) or os.path.getsize(self.json_file_path) == 0:
+            return {}
+        with open(self.json_file_path, 'r') as f:
+            data = json.load(f)
+        return {name: (info['type'], zlib.crc32(format_dates_array(info['completion_dates']).encode('utf-8')),
+                       lambda dates=info['completion_dates']: dates, None)
+                for name, info in data.items()}
+
+    def _read_index(self):
+        """
+        :return: The sidecar index, or None when it is missing or does not match the snapshot.
+        """
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+            stat = os.stat(self.json_file_path)
+        except (OSError, ValueError):
+            return None
+        if index.get('version') != self.INDEX_VERSION or index.get('snapshot_size') != stat.st_size or \
+                index.get('snapshot_mtime_ns') != stat.st_mtime_ns:
+            return None
+        return index
+
+    def _load_index(self):
+        """
+        Create lazy habits from the sidecar index.
+
+        :return: A dictionary of lazy habits, or None when the index is missing or does not match the snapshot.
+        """
+        index = self._read_index()
+        if index is None:
+            return None
+        rollups, checksums = index['rollups'], index['checksums']
+        version = SnapshotVersion(self.json_file_path, file_signature(self.json_file_path))
+        return {name: Habit.lazy(name, habit_type, SnapshotSlice(version, name, start, end, checksums[name]),
+                                 CompletionRollup.from_json(rollups[name]))
+                for name, habit_type, start, end in index['habits']}
+
+    def _dates_array_text(self, habit):
+        """Return the JSON text of a habit's dates, copied unparsed from the old snapshot if it was never loaded."""
+        if isinstance(habit.lazy_source, SnapshotSlice):
+            return habit.lazy_source.read_text()
+        return format_dates_array(list(habit.completion_dates))
+
+    def write_snapshot(self, habits):
+        """Write the habits to the JSON file atomically, and its index in lazy mode."""
+        checksums = {}
+
+        def entries():
+            for name, habit in habits.items():
+                array_text = self._dates_array_text(habit)
+                checksums[name] = zlib.crc32(array_text.encode('utf-8'))
+                yield name, habit.habit_type, array_text
+
+        size, spans = write_indexed_snapshot(self.json_file_path, entries())
+        # What was just written is what later external changes are compared with
+        self._fingerprints = {name: (habit, habit.version, (habit.habit_type, checksums[name]))
+                              for name, habit in habits.items()}
+        if self.lazy:
+            # Habits that are still not loaded now point to their place in the new snapshot
+            version = SnapshotVersion(self.json_file_path, file_signature(self.json_file_path))
+            for name, habit_type, start, end in spans:
+                if isinstance(habits[name].lazy_source, SnapshotSlice):
+                    habits[name].repoint(SnapshotSlice(version, name, start, end, checksums[name]))
+            # The monthly and weekly rollups are kept in the index too, so reports do not load any history
+            rollups = {name: habit.rollup.to_json() for name, habit in habits.items()}
+            stat = os.stat(self.json_file_path)
+            atomic_write_json(self.index_path, {'version': self.INDEX_VERSION, 'snapshot_size': stat.st_size,
+                                                'snapshot_mtime_ns': stat.st_mtime_ns, 'habits': spans,
+                                                'checksums': checksums, 'rollups': rollups}, indent=None)
+        return size
+
+class BinaryStorage(SnapshotStorage):
+    """
+    Stores the habits in the binary columnar format of habit_classes.binary_snapshot, optionally with a journal.
+
+    The snapshot is memory-mapped: loading decodes only names and types, and each habit's ordinals are copied out
+    of the mapping, without any parsing, the first time the habit is used.
+    """
+
+    def __init__(self, file_path, journal=False, compact_threshold=1000, verify=True):
+        """
+        :param file_path: Path to the binary snapshot.
+        :param journal: If True, mutations are appended to a journal next to the snapshot instead of rewriting it.
+        :param compact_threshold: Number of journal records after which the journal is folded into the snapshot.
+        :param verify: If True, check the snapshot's checksum when opening it.
+        """
+        super().__init__(file_path, journal, compact_threshold)
+        self.file_path = file_path
+        self.verify = verify
+        self.snapshot = None
+
+    def open_snapshot(self):
+        """
+        :return: The memory-mapped BinarySnapshot, or None if the file does not exist yet.
+        """
+        if self.snapshot is None and os.path.isfile(self.file_path) and os.path.getsize(self.file_path) > 0:
+            self.snapshot = BinarySnapshot(self.file_path, self.verify)
+        return self.snapshot
+
+    def load_snapshot(self):
+        """Create lazy habits reading their ordinals from the mapped snapshot."""
+        snapshot = self.open_snapshot()
+        if snapshot is None:
+            return {}
+        return {name: Habit.lazy(name, habit_type, lambda name=name: snapshot.habit_ordinals(name))
+                for name, habit_type in zip(snapshot.names, snapshot.types)}
+
+    def checksum(self, habit):
+        """The CRC-32 of the habit's ordinals, read in place from the mapping if the habit is not loaded yet."""
+        return zlib.crc32(habit.ordinals if habit.is_loaded else habit.lazy_source())
+
+    def scan_snapshot(self):
+        """
+        Map the current snapshot afresh and checksum each habit's ordinals in place, without copying them.
+        The old mapping is left to the habits still reading from it.
+        """
+        self.snapshot = None
+        snapshot = self.open_snapshot()
+        if snapshot is None:
+            return {}
+        return {name: (habit_type, zlib.crc32(snapshot.habit_ordinals(name)),
+                       lambda name=name: snapshot.habit_ordinals(name), None)
+                for name, habit_type in zip(snapshot.names, snapshot.types)}
+
+    def write_snapshot(self, habits):
+        """Write a new snapshot; the next load maps it in place of the old one."""
+        # Habits still reading from the old mapping are loaded first, so it can be unmapped before the file is replaced
+        for habit in habits.values():
+            habit.load()
+        self.close()
+        self._fingerprints = {name: (habit, habit.version, (habit.habit_type, zlib.crc32(habit.ordinals)))
+                              for name, habit in habits.items()}
+        return write_binary_snapshot(self.file_path, habits)
+
+    def close(self):
+        """Unmap the snapshot."""
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+class SQLiteStorage(StorageBackend):
+    """
+    Stores the habits in an SQLite database.
+
+    Completions are keyed by (habit, date) and indexed by date, so a completion is a single INSERT and
+    date-range analytics are answered by indexed queries instead of scanning every habit in Python.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            name TEXT PRIMARY KEY,
+            type TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS completions (
+            habit TEXT NOT NULL REFERENCES habits(name) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            PRIMARY KEY (habit, date)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS completions_by_date ON completions(date, habit);
+    """
+
+    def __init__(self, db_file_path):
+        """
+        Open (and create if needed) the database.
+
+        :param db_file_path: Path to the SQLite database file.
+        """
+        self.db_file_path = db_file_path
+        # The connection may be used from a worker thread; callers serialize access to the tracker
+        self.connection = sqlite3.connect(os.fspath(db_file_path), check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(self.SCHEMA)
+        # Memoized (habit, version, fingerprint) per habit name, see fingerprint()
+        self._fingerprints = {}
+
+    def signature(self):
+        """SQLite's data_version, which changes whenever another connection commits to the database."""
+        return self.connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def checksum(self, habit):
+        """The CRC-32 of the habit's dates joined with commas, as reload reads them."""
+        return zlib.crc32(','.join(habit.completion_dates).encode('utf-8'))
+
+    def reload(self, habits):
+        """
+        Read each habit's dates as one string and compare its checksum with the in-memory habit, so Habit objects
+        are built, and dates parsed, only for the habits that differ.
+        """
+        stored = {}
+        # The completions primary key (habit, date) feeds each group in date order
+        rows = self.connection.execute('''SELECT h.name, h.type, group_concat(c.date, ',')
+                                          FROM habits h LEFT JOIN completions c ON c.habit = h.name
+                                          GROUP BY h.name''')
+        for name, habit_type, dates in rows:
+            ours = habits.get(name)
+            if ours is not None and self.fingerprint(ours) == (habit_type, zlib.crc32((dates or '').encode('utf-8'))):
+                stored[name] = None
+            else:
+                stored[name] = Habit(name, habit_type, dates.split(',') if dates else [])
+        self._fingerprints = {name: entry for name, entry in self._fingerprints.items() if name in stored}
+        return stored
+
+    def load(self):
+        """Load every habit together with its completion dates, ordered by date."""
+        completion_dates = {}
+        for name, date in self.connection.execute('SELECT habit, date FROM completions ORDER BY habit, date'):
+            completion_dates.setdefault(name, []).append(date)
+        return {name: Habit(name, habit_type, completion_dates.get(name, []))
+                for name, habit_type in self.connection.execute('SELECT name, type FROM habits')}
+
+    def save(self, habits):
+        """Replace the content of the database with the given habits in a single transaction."""
+        with self.connection:
+            self.connection.execute('DELETE FROM completions')
+            self.connection.execute('DELETE FROM habits')
+            self.connection.executemany('INSERT INTO habits (name, type) VALUES (?, ?)',
+                                        ((name, habit.habit_type) for name, habit in habits.items()))
+            self.connection.executemany('INSERT OR IGNORE INTO completions (habit, date) VALUES (?, ?)',
+                                        ((name, date) for name, habit in habits.items() for date in habit.completion_dates))
+
+    def apply(self, records, habits):
+        """Translate each record into a single statement and commit them together."""
+        with self.connection:
+            for record in records:
+                op = record['op']
+                if op == 'add':
+                    self.connection.execute('INSERT OR IGNORE INTO habits (name, type) VALUES (?, ?)',
+                                            (record['name'], record['type']))
+                    self.connection.executemany('INSERT OR IGNORE INTO completions (habit, date) VALUES (?, ?)',
+                                                ((record['name'], date) for date in record['completion_dates']))
+                elif op == 'complete':
+                    self.connection.execute('INSERT OR IGNORE INTO completions (habit, date) VALUES (?, ?)',
+                                            (record['name'], record['date']))
+                elif op == 'fill':
+                    first = date.fromisoformat(record['first']).toordinal()
+                    last = date.fromisoformat(record['last']).toordinal()
+                    self.connection.executemany('INSERT OR IGNORE INTO completions (habit, date) VALUES (?, ?)',
+                                                ((record['name'], date.fromordinal(ordinal).isoformat())
+                                                 for ordinal in range(first, last + 1)))
+                elif op == 'remove':
+                    self.connection.execute('DELETE FROM habits WHERE name = ?', (record['name'],))
+
+    def month_done(self, habits, year, month):
+        """
+        Count the completed days (daily habits) and completed ISO weeks (weekly habits) of a month with a single
+        query on the date index, without building any rollup.
+        """
+        first_day = date(year, month, 1)
+        last_day = date(year, month, calendar.monthrange(year, month)[1])
+        weeks = month_weeks(year, month)
+        # Monday of the month's first ISO week and Sunday of its last one
+        first_monday, last_sunday = date.fromordinal(weeks.start * 7 + 1), date.fromordinal(weeks.stop * 7)
+        counts = {name: 0 for name, habit in habits.items() if habit.habit_type in ('daily', 'weekly')}
+        # julianday(date) - 1721425.5 is the day ordinal minus one, so dividing it by 7 gives the week number
+        rows = self.connection.execute(
+            '''SELECT c.habit, h.type,
+                      SUM(c.date BETWEEN :first_day AND :last_day),
+                      COUNT(DISTINCT CASE WHEN c.date BETWEEN :first_monday AND :last_sunday
+                                     THEN CAST(julianday(c.date) - 1721425.5 AS INTEGER) / 7 END)
+               FROM completions c JOIN habits h ON h.name = c.habit
+               WHERE c.date BETWEEN :range_first AND :range_last
+               GROUP BY c.habit''',
+            {'first_day': first_day.isoformat(), 'last_day': last_day.isoformat(),
+             'first_monday': first_monday.isoformat(), 'last_sunday': last_sunday.isoformat(),
+             'range_first': min(first_day, first_monday).isoformat(),
+             'range_last': max(last_day, last_sunday).isoformat()})
+        for name, habit_type, days, week_count in rows:
+            if name in counts:
+                counts[name] = week_count if habit_type == 'weekly' else days
+        return counts
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+BINARY_EXTENSIONS = ('.hbt',)
+
+def open_storage(file_path, **options):
+    """
+    Pick the storage backend matching the extension of file_path.
+
+    :param file_path: Path to the data file. SQLite is used for .db, .sqlite and .sqlite3 files, the binary format
+                      for .hbt files and JSON otherwise.
+    :param options: Extra keyword arguments for JSONStorage (journal, compact_threshold, lazy).
+    :return: A StorageBackend instance.
+    """
+    extension = os.path.splitext(os.fspath(file_path))[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SQLiteStorage(file_path)
+    if extension in BINARY_EXTENSIONS:
+        options.pop('lazy', None)  # Binary snapshots are always loaded lazily
+        return BinaryStorage(file_path, **options)
+    return JSONStorage(file_path, **options)
+
+def apply_record(habits, record):
+    """
+    Apply a single mutation record to a dictionary of habits.
+
+    :param habits: A dictionary mapping habit names to Habit objects.
+    :param record: The mutation record to apply.
+    """
+    op = record.get('op')
+    name = record.get('name')
+    if op == 'add':
+        if name not in habits:
+            habits[name] = Habit(name, record['type'], list(record['completion_dates']))
+    elif op == 'complete':
+        if name in habits:
+            habits[name].add_completion(record['date'])
+    elif op == 'fill':
+        if name in habits:
+            for ordinal in range(date.fromisoformat(record['first']).toordinal(),
+                                 date.fromisoformat(record['last']).toordinal() + 1):
+                habits[name].add_completion(ordinal)
+    elif op == 'remove':
+        habits.pop(name, None)
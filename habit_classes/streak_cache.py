@@ -0,0 +1,125 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date, datetime
+from habit_classes.instrumentation import metrics
+
+class _HabitStreaks:
+    """The cached streak data of one version of one habit."""
+
+    __slots__ = ('habit', 'version', 'segments', 'first_units', 'reference', 'current')
+
+    def __init__(self, habit):
+        self.habit = habit
+        self.version = habit.version
+        # Built on first use: only past-date and history queries need them
+        self.segments = None
+        self.first_units = None
+        # Day ordinal the current streak was computed for
+        self.reference = None
+        self.current = 0
+
+    def load_segments(self):
+        """Split the habit's history into streak segments, once per version."""
+        if self.segments is None:
+            self.segments = self.habit.streak_segments()
+            self.first_units = [segment[0] for segment in self.segments]
+
+class StreakCache:
+    """
+    A bounded LRU memo of per-habit streak data: current streak, best-ever streak and the history of streak
+    segments (runs of consecutive days or weeks).
+
+    Entries are keyed by habit name and hold the habit object and its version, so an entry is recomputed as soon
+    as the habit is mutated or replaced. The current streak comes from the habit's incremental streak state and
+    records the day it was computed for, so it is recomputed once the date rolls over. The segments are only built,
+    in one pass over the history, for streaks as of past dates (a binary search over them) and for the history.
+    """
+
+    def __init__(self, max_habits=10000):
+        """
+        :param max_habits: Maximum number of habits kept in the cache; the least recently used are evicted.
+        """
+        self.max_habits = max_habits
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entry(self, habit):
+        """Return the up-to-date entry of a habit, computing it if needed."""
+        entry = self._entries.get(habit.name)
+        if entry is not None and entry.habit is habit and entry.version == habit.version:
+            self.hits += 1
+            if metrics.enabled:
+                metrics.count('streak_cache_hits')
+            self._entries.move_to_end(habit.name)
+            return entry
+        self.misses += 1
+        if metrics.enabled:
+            metrics.count('streak_cache_misses')
+        entry = self._entries[habit.name] = _HabitStreaks(habit)
+        self._entries.move_to_end(habit.name)
+        while len(self._entries) > self.max_habits:
+            self._entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _streak_at(habit, entry, ordinal):
+        """Length of the run containing the unit of a day, following the rollover rule of Habit.current_streak."""
+        if habit.habit_type not in ('daily', 'weekly'):
+            return 0
+        entry.load_segments()
+        unit = habit.unit_of(ordinal)
+        index = bisect_right(entry.first_units, unit) - 1
+        if index < 0 or entry.segments[index][1] < unit:
+            # No completion in that day or week: the streak was broken
+            return 0
+        return unit - entry.segments[index][0] + 1
+
+    def current(self, habit, today=None):
+        """
+        :param habit: The Habit.
+        :param today: The reference date (datetime.date), defaults to today.
+        :return: The current streak, like Habit.verify_streak.
+        """
+        today = today or datetime.today().date()
+        entry = self._entry(habit)
+        if entry.reference != today.toordinal():
+            entry.current = habit.current_streak(today)
+            entry.reference = today.toordinal()
+        return entry.current
+
+    def longest(self, habit):
+        """
+        :return: The longest run of consecutive days or weeks the habit ever had, from its incremental streak state.
+        """
+        return habit.longest_streak()
+
+    def as_of(self, habit, day):
+        """
+        :param habit: The Habit.
+        :param day: Any date (datetime.date).
+        :return: The streak the habit had on that day, counting only the completions up to that day or week.
+        """
+        return self._streak_at(habit, self._entry(habit), day.toordinal())
+
+    def segments(self, habit):
+        """
+        :param habit: The Habit.
+        :return: A list of (first completion date, last completion date, length) tuples, one per run of consecutive
+                 days or weeks, oldest first; the length is in days or weeks.
+        """
+        entry = self._entry(habit)
+        entry.load_segments()
+        return [(date.fromordinal(first_ordinal), date.fromordinal(last_ordinal), last - first + 1)
+                for first, last, first_ordinal, last_ordinal in entry.segments]
+
+    def discard(self, name):
+        """Drop the entry of a habit, e.g. when it is removed."""
+        self._entries.pop(name, None)
+
+    def clear(self):
+        """Drop every entry."""
+        self._entries.clear()
@@ -0,0 +1,162 @@
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from urllib.parse import quote
+from habit_classes.habit_tracker import HabitTracker
+
+logger = logging.getLogger('habit_tracker')
+
+class _ProfileSlot:
+    """The lock of one profile and its loaded tracker, if any."""
+
+    __slots__ = ('lock', 'tracker', 'users', '__weakref__')
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tracker = None
+        # Number of callers inside or waiting for tracker(); a slot in use is never evicted
+        self.users = 0
+
+class TrackerManager:
+    """
+    Serves the habit trackers of many user profiles, each stored in its own data file.
+
+    Profile files are sharded into sub-directories named after a hash prefix, so no directory grows too large.
+    At most max_open trackers stay loaded: opening one more evicts the least recently used idle tracker, writing its
+    pending mutations back first; a tracker that cannot be written stays loaded, with its mutations, until a later
+    eviction, flush_all() or close() succeeds. Calls for the same profile are serialized by a per-profile lock, while different
+    profiles can be used concurrently. Locks of profiles that are neither loaded nor in use are dropped, so memory
+    stays bounded however many profiles exist.
+    """
+
+    def __init__(self, data_dir, max_open=64, shard_width=2, extension='.json', **tracker_options):
+        """
+        :param data_dir: Root directory of the profile files.
+        :param max_open: Maximum number of idle trackers kept loaded.
+        :param shard_width: Number of hexadecimal digits of the hash prefix naming the shard directories.
+        :param extension: Extension of the profile files, which selects the storage backend (.json, .db, .hbt).
+        :param tracker_options: Extra keyword arguments for HabitTracker. Trackers are created with autosave off
+                                by default: mutations are written on flush_all(), on eviction and on close().
+        """
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1.")
+        self.data_dir = data_dir
+        self.max_open = max_open
+        self.shard_width = shard_width
+        self.extension = extension
+        self.tracker_options = dict({'autosave': False}, **tracker_options)
+        self._lock = threading.Lock()
+        self._slots = weakref.WeakValueDictionary()
+        # Loaded trackers, least recently used first
+        self._open = OrderedDict()
+
+    def profile_path(self, profile):
+        """
+        :param profile: The name of a user profile.
+        :return: The path of the profile's data file: <data_dir>/<hash prefix>/<quoted profile name><extension>.
+        """
+        if not profile:
+            raise ValueError("The profile name cannot be empty.")
+        shard = hashlib.sha1(profile.encode('utf-8')).hexdigest()[:self.shard_width]
+        # Quoting keeps any character that is not safe in a file name (like '/') out of the path
+        return os.path.join(self.data_dir, shard, quote(profile, safe='') + self.extension)
+
+    @contextlib.contextmanager
+    def tracker(self, profile):
+        """
+        Lock a profile and give access to its HabitTracker, loading it if needed.
+
+        Usage: with manager.tracker('alice') as tracker: tracker.add_habit(...)
+
+        :param profile: The name of a user profile. Its file is created on first use.
+        """
+        with self._lock:
+            slot = self._slots.get(profile)
+            if slot is None:
+                slot = self._slots[profile] = _ProfileSlot()
+            slot.users += 1
+        try:
+            with slot.lock:
+                if slot.tracker is None:
+                    path = self.profile_path(profile)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    slot.tracker = HabitTracker(path, **self.tracker_options)
+                with self._lock:
+                    self._open[profile] = slot
+                    self._open.move_to_end(profile)
+                yield slot.tracker
+        finally:
+            with self._lock:
+                slot.users -= 1
+            self._evict()
+
+    def _evict(self):
+        """
+        Close least recently used idle trackers until at most max_open are loaded.
+
+        A tracker whose write fails is put back, least recently used, and the error is logged: it belongs to another
+        profile than the caller's, whose own call succeeded.
+        """
+        failed = set()
+        while True:
+            with self._lock:
+                if len(self._open) <= self.max_open:
+                    return
+                victim = next((profile for profile, slot in self._open.items()
+                               if slot.users == 0 and profile not in failed), None)
+                if victim is None:
+                    # Every loaded tracker is in use (or could not be written); the pool shrinks back later
+                    return
+                slot = self._open.pop(victim)
+            # The tracker is written back outside the manager lock, so other profiles are not held up
+            with slot.lock:
+                with self._lock:
+                    # The profile may have been opened again while waiting for its lock
+                    reopened = victim in self._open
+                if not reopened and slot.tracker is not None:
+                    try:
+                        slot.tracker.close()
+                    except Exception:
+                        logger.exception("Could not write back the tracker of profile %r", victim)
+                        failed.add(victim)
+                        with self._lock:
+                            if victim not in self._open:
+                                self._open[victim] = slot
+                                self._open.move_to_end(victim, last=False)
+                        continue
+                    slot.tracker = None
+
+    @property
+    def open_profiles(self):
+        """The profiles whose tracker is loaded, least recently used first."""
+        with self._lock:
+            return list(self._open)
+
+    def flush_all(self):
+        """
+        Write the pending mutations of every loaded tracker.
+
+        :return: The number of trackers that had something to write.
+        """
+        with self._lock:
+            slots = list(self._open.values())
+        flushed = 0
+        for slot in slots:
+            with slot.lock:
+                if slot.tracker is not None and slot.tracker.flush():
+                    flushed += 1
+        return flushed
+
+    def close(self):
+        """Write back and close every loaded tracker."""
+        with self._lock:
+            slots, self._open = list(self._open.values()), OrderedDict()
+        for slot in slots:
+            with slot.lock:
+                if slot.tracker is not None:
+                    slot.tracker.close()
+                    slot.tracker = None
@@ -1,8 +1,8 @@
-import json
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import scrolledtext
 from habit_classes.habit_tracker import HabitTracker
+from habit_gui.tracker_worker import TrackerWorker
 
 class HabitTrackerApp():
     """
@@ -10,39 +10,90 @@ class HabitTrackerApp():
     This class defines the user interface and interactions for managing habits.
     """
 
+    # Delay in milliseconds between the first unsaved change and the write that persists it together with
+    # every change made in the meantime
+    SAVE_DELAY_MS = 1000
+    # How often, in milliseconds, the data file is checked for changes made by another program
+    WATCH_INTERVAL_MS = 2000
+
     def __init__(self, master, json_file_path):
         """
         Initialize the GUI application with the master window and a path to the habit data JSON file.
 
+        The tracker is the only owner of the data file: the GUI never reads or writes it directly.
+        Changes are kept in memory (already sorted) and written in one batch shortly after the first one.
+        Every tracker operation runs on a background worker so the window never freezes.
+
         :param master: The Tkinter root window.
         :param json_file_path: Path to the JSON file where habit data is stored.
         """
         self.master = master
-        self.tracker = HabitTracker(json_file_path)
+        self.tracker = HabitTracker(json_file_path, autosave=False, lazy=True)
         self.json_file_path = json_file_path
+        self._save_job = None
         self.create_widgets()
-        self.schedule_sorting()
+        self.worker = TrackerWorker(master, status_callback=self.update_status)
+        self._watch_job = self.master.after(self.WATCH_INTERVAL_MS, self.watch_file)
+        self.master.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def watch_file(self):
+        """
+        Periodically merge changes made to the data file by another program (a sync tool, a second window or a script).
+        The check itself is a single stat call on the worker thread.
+        """
+        self.worker.submit(self.tracker.check_external_changes, self.report_external_changes)
+        self._watch_job = self.master.after(self.WATCH_INTERVAL_MS, self.watch_file)
 
-    def sort_completion_dates(self):
+    def report_external_changes(self, changes):
         """
-        Sort the completion dates of each habit in the JSON file.
+        Tell the user which habits were changed by another program, if any.
         """
-        with open(self.json_file_path, 'r') as file:
-            data = json.load(file)
+        if not changes:
+            return
+        for kind in ('added', 'removed', 'changed', 'conflicts'):
+            if changes[kind]:
+                self.show_message(f"Data file changed externally, {kind}: {', '.join(changes[kind])}")
 
-        for habit, details in data.items():
-            sorted_dates = sorted(details['completion_dates'], key=lambda x: datetime.strptime(x, '%Y-%m-%d'))
-            details['completion_dates'] = sorted_dates
+    def schedule_save(self):
+        """
+        Schedule a write of the pending changes. Changes made before the write runs are coalesced into it.
+        """
+        if self._save_job is None:
+            self._save_job = self.master.after(self.SAVE_DELAY_MS, self.save_changes)
 
-        with open(self.json_file_path, 'w') as file:
-            json.dump(data, file, indent=4)
+    def save_changes(self):
+        """
+        Write the pending changes, if any, to the data file on the worker thread.
+        """
+        self._save_job = None
+        self.worker.submit(self.tracker.flush)
 
-    def schedule_sorting(self):
+    def on_close(self):
         """
-        Schedule periodic sorting of completion dates.
+        Write any pending change and wait for the worker to finish before closing the window.
         """
-        self.sort_completion_dates()
-        self.master.after(2000, self.schedule_sorting)
+        if self._save_job is not None:
+            self.master.after_cancel(self._save_job)
+        self.master.after_cancel(self._watch_job)
+        self.save_changes()
+        self.worker.submit(self.tracker.close)
+        try:
+            self.worker.shutdown()
+        finally:
+            # Close the window even if the final write failed
+            self.master.destroy()
+
+    def update_status(self, queue_depth, latency):
+        """
+        Show how many operations are waiting for the worker and how long the last one took.
+        """
+        self.status_label.config(text=f"Queued operations: {queue_depth} | Last operation: {latency * 1000:.0f} ms")
+
+    def show_message(self, message):
+        """
+        Append a message to the output box.
+        """
+        self.output_text.insert(tk.END, f"{message}\n")
 
     def create_widgets(self):
         """
@@ -121,6 +172,10 @@ class HabitTrackerApp():
         self.struggled_habits_button = tk.Button(self.master, text="Struggled Habits Last Month", command=self.display_struggled_habits)
         self.struggled_habits_button.grid(row=12, column=1, columnspan=3, pady=(10, 10))  # Same padding for alignment
 
+        # Label showing whether tracker operations are backing up on the worker thread
+        self.status_label = tk.Label(self.master, text="Queued operations: 0 | Last operation: 0 ms")
+        self.status_label.grid(row=13, column=0, columnspan=3, pady=(0, 10))
+
 
     def add_habit(self):
         """
@@ -128,8 +183,8 @@ class HabitTrackerApp():
         """
         name = self.add_name_entry.get()
         habit_type = self.habit_type_var.get()
-        self.tracker.add_habit(name, habit_type, [])
-        self.output_text.insert(tk.END, f"Added habit: {name} ({habit_type})\n")
+        self.worker.submit(lambda: self.tracker.add_habit(name, habit_type, []), self.show_message)
+        self.schedule_save()
         self.add_name_entry.delete(0, tk.END)
 
     def update_habit(self):
@@ -138,15 +193,14 @@ class HabitTrackerApp():
         """
         name = self.update_name_entry.get()
         custom_date = self.update_date_entry.get()
-        
+        prefix = ""
+
         if not custom_date:  # If no date is provided, use today's date
             custom_date = datetime.today().strftime('%Y-%m-%d')
-            message = f"No date entered. Using today's date: {custom_date}. "
-            message += self.tracker.update_habit_custom_date(name, custom_date)
-        else:
-            message = self.tracker.update_habit_custom_date(name, custom_date)
+            prefix = f"No date entered. Using today's date: {custom_date}. "
+        self.worker.submit(lambda: prefix + self.tracker.update_habit_custom_date(name, custom_date), self.show_message)
+        self.schedule_save()
 
-        self.output_text.insert(tk.END, f"{message}\n")
         self.update_name_entry.delete(0, tk.END)
         self.update_date_entry.delete(0, tk.END)
 
@@ -155,61 +209,71 @@ class HabitTrackerApp():
         Remove a habit from the tracker.
         """
         name = self.remove_name_entry.get()
-        message = self.tracker.remove_habit(name)
-        self.output_text.insert(tk.END, f"{message}\n")
+        self.worker.submit(lambda: self.tracker.remove_habit(name), self.show_message)
+        self.schedule_save()
         self.remove_name_entry.delete(0, tk.END)
+
     def display_streak(self):
         """
         Display habit streak when the "Display Streak" button is pressed
-        """        
+        """
         name = self.display_name_entry.get()
-        if name in self.tracker.habits:
-            streak = self.tracker.habits[name].verify_streak()
+
+        def streak_message():
+            if name not in self.tracker.habits:
+                return f"Habit not found: {name}"
+            streak = self.tracker.streak_as_of(name)
             day_or_week = self.tracker.habits[name].day_or_week()
-            self.output_text.insert(tk.END, f"{name} streak: {streak} - {day_or_week}\n")
-        else:
-            self.output_text.insert(tk.END, f"Habit not found: {name}\n")
+            return f"{name} streak: {streak} - {day_or_week}"
+
+        self.worker.submit(streak_message, self.show_message)
         self.display_name_entry.delete(0, tk.END)  # Clear the entry field after displaying
+
     def display_longest_streak(self):
         """
         Returns the name of the habit for which we had the longest streak
-        """           
-        name, streak = self.tracker.longest_habit_streak()
-        day_or_week = self.tracker.habits[name].day_or_week()
-        if name:
-            self.output_text.insert(tk.END, f"Longest Streak: {name} with {streak} {day_or_week}.\n")
-        else:
-            self.output_text.insert(tk.END, "No streaks to display.\n")
- 
+        """
+        def longest_streak_message():
+            name, streak = self.tracker.longest_habit_streak()
+            if name:
+                day_or_week = self.tracker.habits[name].day_or_week()
+                return f"Longest Streak: {name} with {streak} {day_or_week}."
+            return "No streaks to display."
+
+        self.worker.submit(longest_streak_message, self.show_message)
+
     def display_current_daily_habits(self):
         """
         Returns the name of all the daily habits
-        """             
-        daily_habits = self.tracker.current_daily_habits()  # Make sure this calls the correct method
-        if len(daily_habits) == 0:
-            self.output_text.insert(tk.END, "You currently have no daily habits.\n")
-        else:
-            self.output_text.insert(tk.END, f"Current Daily Habits: {', '.join(daily_habits)}\n")
-            
+        """
+        def daily_habits_message():
+            daily_habits = self.tracker.current_daily_habits()
+            if len(daily_habits) == 0:
+                return "You currently have no daily habits."
+            return f"Current Daily Habits: {', '.join(daily_habits)}"
+
+        self.worker.submit(daily_habits_message, self.show_message)
+
     def display_current_weekly_habits(self):
         """
         Returns the name of all the weekly habits
-        """              
-        weekly_habits = self.tracker.current_weekly_habits()
-        if len(weekly_habits) == 0:
-            self.output_text.insert(tk.END, "You currently have no weekly habits.\n")
-        else:
-            self.output_text.insert(tk.END, f"Current Weekly Habits: {', '.join(weekly_habits)}\n")
-  
+        """
+        def weekly_habits_message():
+            weekly_habits = self.tracker.current_weekly_habits()
+            if len(weekly_habits) == 0:
+                return "You currently have no weekly habits."
+            return f"Current Weekly Habits: {', '.join(weekly_habits)}"
+
+        self.worker.submit(weekly_habits_message, self.show_message)
+
     def display_struggled_habits(self):
         """
         Returns the name of habit that we skipped for most days in case of daily habits or weeks in case of weekly habits
-        """              
-        struggled_habits = self.tracker.habits_most_struggled_last_month()
-        if len(struggled_habits) < 3:
-            self.output_text.insert(tk.END, "This function will be available once you will have created at least 3 habits.\n")
-        elif len(struggled_habits) >= 3:
-            self.output_text.insert(tk.END, f"3 Habits struggled most last month: {', '.join(struggled_habits)}\n")
-        else:
-            self.output_text.insert(tk.END, "The application has encountered an unexpected problem.\n")
-            
\ No newline at end of file
+        """
+        def struggled_habits_message():
+            struggled_habits = self.tracker.habits_most_struggled_last_month()
+            if len(struggled_habits) < 3:
+                return "This function will be available once you will have created at least 3 habits."
+            return f"3 Habits struggled most last month: {', '.join(struggled_habits)}"
+
+        self.worker.submit(struggled_habits_message, self.show_message)
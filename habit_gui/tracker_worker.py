@@ -0,0 +1,76 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class TrackerWorker:
+    """
+    Runs HabitTracker operations on a background thread so the Tk event loop never blocks on disk or analytics.
+
+    Operations are executed one at a time in submission order on a single thread, which keeps mutations of the same
+    habit ordered and means the tracker is never touched by two threads at once. Results are handed back to the
+    Tk main loop, which polls for them with master.after, so callbacks can safely update widgets.
+    """
+
+    # How often, in milliseconds, the Tk main loop checks for finished operations
+    POLL_MS = 50
+
+    def __init__(self, master, status_callback=None):
+        """
+        :param master: The Tkinter root window whose event loop receives the results.
+        :param status_callback: Optional function called on the main thread with (queue depth, last latency in seconds)
+                                whenever an operation finishes or is submitted.
+        """
+        self.master = master
+        self.status_callback = status_callback
+        self.queue_depth = 0
+        self.last_latency = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='habit-tracker-worker')
+        self._results = queue.Queue()
+        self._poll_job = self.master.after(self.POLL_MS, self._poll)
+
+    def submit(self, operation, callback=None):
+        """
+        Queue an operation for the worker thread. Must be called from the Tk main thread.
+
+        :param operation: A function without arguments run on the worker thread.
+        :param callback: Optional function called on the main thread with the operation's return value.
+        """
+        submitted = time.perf_counter()
+        self.queue_depth += 1
+        future = self._executor.submit(operation)
+        future.add_done_callback(lambda done: self._results.put((done, callback, submitted)))
+        self._report_status()
+
+    def _poll(self):
+        """Deliver the results of finished operations to their callbacks and schedule the next poll."""
+        self._poll_job = self.master.after(self.POLL_MS, self._poll)
+        self._drain()
+
+    def _drain(self):
+        """Deliver every result currently waiting in the results queue."""
+        delivered = False
+        while True:
+            try:
+                future, callback, submitted = self._results.get_nowait()
+            except queue.Empty:
+                break
+            delivered = True
+            self.queue_depth -= 1
+            self.last_latency = time.perf_counter() - submitted
+            # Re-raise errors from the worker thread here, where Tk reports them like any other callback error
+            result = future.result()
+            if callback is not None:
+                callback(result)
+        if delivered:
+            self._report_status()
+
+    def _report_status(self):
+        """Tell the status callback about the current queue depth and latency."""
+        if self.status_callback is not None:
+            self.status_callback(self.queue_depth, self.last_latency)
+
+    def shutdown(self):
+        """Wait for every queued operation to finish and deliver the remaining results."""
+        self.master.after_cancel(self._poll_job)
+        self._executor.shutdown(wait=True)
+        self._drain()
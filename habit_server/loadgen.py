@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+class Connection:
+    """A minimal keep-alive HTTP/1.1 client connection speaking JSON."""
+
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method, path, payload=None):
+        """
+        Send one request and read its response.
+
+        :return: A tuple (status code, decoded JSON body).
+        """
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self.writer.write(head.encode('latin-1') + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            if key.strip().lower() == 'content-length':
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length)) if length else None
+
+    def close(self):
+        self.writer.close()
+
+def percentile(sorted_values, fraction):
+    """
+    :param sorted_values: A sorted list of numbers.
+    :param fraction: The percentile as a fraction, e.g. 0.99.
+    :return: The nearest-rank percentile, or 0.0 for an empty list.
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def run_load(host, port, connections=20, requests=2000, habits=10, complete_ratio=0.8, seed=0):
+    """
+    Drive a running habit server with concurrent clients.
+
+    The habits 'load 0' ... 'load N' are created first. Then every connection sends requests back to back:
+    completions of a random habit on a random past day (complete_ratio of them) and streak queries otherwise.
+
+    :param host: The server host.
+    :param port: The server port.
+    :param connections: Number of concurrent keep-alive connections.
+    :param requests: Total number of requests of the timed phase.
+    :param habits: Number of habits completions are spread over; fewer habits mean more same-habit contention.
+    :param complete_ratio: Share of completions among the requests.
+    :param seed: Seed of the request mix.
+    :return: A dictionary with the throughput, latency percentiles in milliseconds and response status counts.
+    """
+    rng = random.Random(seed)
+    names = [f"load {index}" for index in range(habits)]
+    setup = await Connection.open(host, port)
+    for name in names:
+        await setup.request('POST', '/habits', {'name': name, 'type': 'daily'})
+    setup.close()
+
+    today = datetime.today().date()
+    plan = []
+    for _ in range(requests):
+        path = '/habits/' + quote(rng.choice(names), safe='')
+        if rng.random() < complete_ratio:
+            day = today - timedelta(days=rng.randrange(3650))
+            plan.append(('POST', path + '/completions', {'date': day.strftime('%Y-%m-%d')}))
+        else:
+            plan.append(('GET', path + '/streak', None))
+    latencies = []
+    statuses = {}
+
+    async def client(share):
+        connection = await Connection.open(host, port)
+        try:
+            for method, path, payload in share:
+                start = time.perf_counter()
+                status, _ = await connection.request(method, path, payload)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(plan[index::connections]) for index in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {'requests': len(latencies), 'seconds': elapsed, 'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': percentile(latencies, 0.50) * 1000, 'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0, 'statuses': statuses}
+
+def main(argv=None):
+    """Command line entry point: python -m habit_server.loadgen --url http://127.0.0.1:8080 --requests 5000"""
+    parser = argparse.ArgumentParser(description="Load test a running habit server.")
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help="Base URL of the server.")
+    parser.add_argument('--connections', type=int, default=20, help="Concurrent keep-alive connections.")
+    parser.add_argument('--requests', type=int, default=2000, help="Total number of requests.")
+    parser.add_argument('--habits', type=int, default=10, help="Number of habits the requests are spread over.")
+    parser.add_argument('--complete-ratio', type=float, default=0.8, help="Share of completion requests.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the request mix.")
+    args = parser.parse_args(argv)
+
+    url = urlsplit(args.url)
+    report = asyncio.run(run_load(url.hostname, url.port or 80, args.connections, args.requests, args.habits,
+                                  args.complete_ratio, args.seed))
+    print(f"{report['requests']} requests in {report['seconds']:.2f} s: {report['requests_per_second']:.0f} req/s, "
+          f"p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms, max {report['max_ms']:.2f} ms")
+    print(f"Statuses: {report['statuses']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+from habit_classes.habit_tracker import HabitTracker
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 1 << 20
+
+logger = logging.getLogger('habit_server')
+
+class HTTPError(Exception):
+    """An error answered with an HTTP status and a JSON message."""
+
+    def __init__(self, status, message, close=False):
+        """
+        :param status: An HTTPStatus.
+        :param message: The message of the JSON response.
+        :param close: Whether the connection is closed after the response, e.g. when the rest of the stream cannot
+                      be told apart from the request body.
+        """
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.close = close
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    :param reader: The asyncio.StreamReader of the connection.
+    :return: A tuple (method, path, headers, body), or None when the client closed the connection.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length header.", close=True)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+def encode_response(status, payload, keep_alive=True):
+    """
+    :param status: An HTTPStatus.
+    :param payload: A JSON-serializable object.
+    :param keep_alive: Whether the connection stays open after the response.
+    :return: The bytes of the HTTP/1.1 response.
+    """
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+class HabitServer:
+    """
+    A headless HTTP/JSON API in front of one HabitTracker, built on asyncio streams.
+
+    Endpoints:
+        GET    /habits                       list the habits with their type and current streak
+        POST   /habits                       add a habit: {"name": ..., "type": "daily"|"weekly"}
+        DELETE /habits/<name>                remove a habit
+        POST   /habits/<name>/completions    complete a habit: {"date": "YYYY-MM-DD"}, today by default
+        GET    /habits/<name>/streak         current and longest streak of a habit
+        GET    /longest                      habit with the longest current streak
+        GET    /struggled?year=&month=       habits struggled with most in a month, last month by default
+
+    The tracker is only ever touched by a single executor thread, so the event loop never blocks on storage or
+    analytics and the tracker needs no locking. Completions are not applied one by one: those arriving while a
+    write is in progress are queued and applied together with HabitTracker.apply_batch, i.e. persisted with a
+    single write (group commit).
+    """
+
+    def __init__(self, tracker, max_batch=1024):
+        """
+        :param tracker: The HabitTracker to serve.
+        :param max_batch: Maximum number of completions applied in one write.
+        """
+        self.tracker = tracker
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='habit-server-tracker')
+        self._queued_completions = []
+        self._committer = None
+        self.batches_written = 0
+
+    async def run_in_tracker_thread(self, function, *args):
+        """Run a function on the tracker thread and wait for its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def complete(self, name, custom_date):
+        """
+        Queue a completion for the next group commit and wait until it is persisted.
+
+        :return: A tuple (message, applied, habit exists).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queued_completions.append(({'op': 'complete', 'name': name, 'date': custom_date}, future))
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.ensure_future(self._commit_completions())
+        return await future
+
+    async def _commit_completions(self):
+        """Apply the queued completions in batches, one write per batch, until the queue is empty."""
+        while self._queued_completions:
+            batch = self._queued_completions[:self.max_batch]
+            del self._queued_completions[:self.max_batch]
+            try:
+                results = await self.run_in_tracker_thread(self._apply_completions, [record for record, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batches_written += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _apply_completions(self, records):
+        """Apply a batch of completions on the tracker thread. Returns (message, applied, habit exists) tuples."""
+        results = self.tracker.apply_batch(records, with_status=True)
+        return [(message, applied, record['name'] in self.tracker.habits)
+                for record, (message, applied) in zip(records, results)]
+
+    def _list_habits(self):
+        today = datetime.today().date()
+        return {name: {'type': habit.habit_type, 'streak': self.tracker.streak_cache.current(habit, today)}
+                for name, habit in self.tracker.habits.items()}
+
+    def _add_habit(self, name, habit_type):
+        return self.tracker.apply_batch([{'op': 'add', 'name': name, 'type': habit_type, 'completion_dates': []}],
+                                        with_status=True)[0]
+
+    def _remove_habit(self, name):
+        return self.tracker.apply_batch([{'op': 'remove', 'name': name}], with_status=True)[0]
+
+    def _streak(self, name):
+        habit = self.tracker.habits.get(name)
+        if habit is None:
+            return None
+        return {'name': name, 'type': habit.habit_type, 'streak': self.tracker.streak_cache.current(habit),
+                'longest': self.tracker.streak_cache.longest(habit)}
+
+    def _longest(self):
+        name, streak = self.tracker.longest_habit_streak()
+        return {'name': name, 'streak': streak}
+
+    def _struggled(self, year, month):
+        if year is None:
+            return self.tracker.habits_most_struggled_last_month()
+        return self.tracker.habits_most_struggled(year, month)
+
+    async def dispatch(self, method, target, body):
+        """
+        Route one request.
+
+        :return: A tuple (HTTPStatus, JSON-serializable payload).
+        """
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')] if url.path.strip('/') else []
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "The body must be a JSON object.")
+
+        if parts == ['habits'] and method == 'GET':
+            return HTTPStatus.OK, await self.run_in_tracker_thread(self._list_habits)
+        if parts == ['habits'] and method == 'POST':
+            name, habit_type = data.get('name'), data.get('type', 'daily')
+            if not isinstance(name, str) or not name or habit_type not in ('daily', 'weekly'):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "A name and a type ('daily' or 'weekly') are required.")
+            message, applied = await self.run_in_tracker_thread(self._add_habit, name, habit_type)
+            return (HTTPStatus.CREATED if applied else HTTPStatus.CONFLICT), {'message': message}
+        if len(parts) == 2 and parts[0] == 'habits' and method == 'DELETE':
+            message, applied = await self.run_in_tracker_thread(self._remove_habit, parts[1])
+            return (HTTPStatus.OK if applied else HTTPStatus.NOT_FOUND), {'message': message}
+        if len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'completions' and method == 'POST':
+            custom_date = data.get('date') or datetime.today().strftime('%Y-%m-%d')
+            message, applied, exists = await self.complete(parts[1], custom_date)
+            status = HTTPStatus.OK if applied else HTTPStatus.BAD_REQUEST if exists else HTTPStatus.NOT_FOUND
+            return status, {'message': message}
+        if len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'streak' and method == 'GET':
+            streak = await self.run_in_tracker_thread(self._streak, parts[1])
+            if streak is None:
+                return HTTPStatus.NOT_FOUND, {'message': f"Habit '{parts[1]}' does not exist."}
+            return HTTPStatus.OK, streak
+        if parts == ['longest'] and method == 'GET':
+            return HTTPStatus.OK, await self.run_in_tracker_thread(self._longest)
+        if parts == ['struggled'] and method == 'GET':
+            query = parse_qs(url.query)
+            try:
+                year = int(query['year'][0]) if 'year' in query else None
+                month = int(query['month'][0]) if year is not None else None
+                if month is not None and not 1 <= month <= 12:
+                    raise ValueError
+            except (KeyError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "year and month must be given together, month from 1 to 12.")
+            return HTTPStatus.OK, {'habits': await self.run_in_tracker_thread(self._struggled, year, month)}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No endpoint for {method} {url.path}.")
+
+    async def handle_connection(self, reader, writer):
+        """Serve the requests of one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                keep_alive = True
+                request = None
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    status, payload = await self.dispatch(method, target, body)
+                except HTTPError as error:
+                    status, payload = error.status, {'message': error.message}
+                    keep_alive = keep_alive and not error.close
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    # Closed mid-request
+                    break
+                except Exception:
+                    if request is None:
+                        # Unreadable request, e.g. a line longer than the stream limit
+                        break
+                    # Any other failure, e.g. an OSError while saving, is answered instead of dropping the connection
+                    logger.exception("Error while handling %s %s", request[0], request[1])
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'message': "Internal server error."}
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080, ready=None):
+        """
+        Serve until cancelled, then write any pending change and close the tracker.
+
+        :param host: The interface to listen on.
+        :param port: The port to listen on, 0 for any free port.
+        :param ready: Optional function called with the bound (host, port) once the server listens.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[:2])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.run_in_tracker_thread(self.tracker.close)
+            self._executor.shutdown()
+
+def main(argv=None):
+    """Command line entry point: python -m habit_server.server data/user_habits.json --port 8080"""
+    parser = argparse.ArgumentParser(description="Serve a habit file over an HTTP/JSON API.")
+    parser.add_argument('json_file', help="Habit file to serve (.json, .db or .hbt).")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on.")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on.")
+    parser.add_argument('--journal', action='store_true', help="Append mutations to a journal instead of rewriting the file.")
+    args = parser.parse_args(argv)
+
+    server = HabitServer(HabitTracker(args.json_file, journal=args.journal))
+    try:
+        asyncio.run(server.serve(args.host, args.port, lambda address: print(f"Serving on http://{address[0]}:{address[1]}")))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -4,17 +4,19 @@ from datetime import datetime, timedelta
 import tkinter as tk
 from habit_gui.habit_tracker_app import HabitTrackerApp
 from habit_classes.habit_tracker import HabitTracker
+from habit_classes.tracker_manager import TrackerManager
+
+# Root directory of the per-user profile files, sharded by TrackerManager
+PROFILES_DIR = 'data/profiles'
 
 def chosen_file():
-    """Prompt the user to select a mode and return the appropriate JSON file path based on their choice of either run the application in test mode or use it as intended in user mode."""
+    """Prompt the user to select a mode and return the appropriate JSON file path based on their choice of either run the application in test mode, use it as intended in user mode or open a named user profile."""
     string_mode = "n"
-    while string_mode not in ("t", "u"):
-        string_mode = input("Please press 't' for Test mode or 'u' for standard User mode: ")        
+    while string_mode not in ("t", "u", "p"):
+        string_mode = input("Please press 't' for Test mode, 'u' for standard User mode or 'p' for a user Profile: ")        
         if string_mode == "t":
             json_file_path = 'data/sample_habits.json'
-            habit_tracker = HabitTracker(json_file_path)
-            habit_tracker.fill_missing_dates()  
-            habit_tracker.save_habits()        
+            HabitTracker.fill_missing_dates_in_files([json_file_path])
         elif string_mode == "u":
             json_file_path = 'data/user_habits.json'
             if not os.path.exists(json_file_path):
@@ -24,8 +26,15 @@ def chosen_file():
                 print(f"File '{json_file_path}' has been created.")
             else:
                 print(f"File '{json_file_path}' already exists.")
+        elif string_mode == "p":
+            profile = ""
+            while not profile:
+                profile = input("Profile name: ").strip()
+            json_file_path = TrackerManager(PROFILES_DIR).profile_path(profile)
+            os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
+            print(f"Using the habits of profile '{profile}' in '{json_file_path}'.")
         else:
-            print("Invalid mode selected. Please choose 't' for Test mode or 'u' for User mode.")          
+            print("Invalid mode selected. Please choose 't' for Test mode, 'u' for User mode or 'p' for a Profile.")          
     
     return json_file_path
 
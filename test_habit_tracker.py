@@ -45,6 +45,899 @@ def test_add_habit_with_duplicate_name(tracker):
     Test that adding a habit with a name that already exists does not create a duplicate.
     """
     habit_name = "Meditate"
-    tracker.add_habit(habit_name, "daily", [])  # Add a habit.
-    tracker.add_habit(habit_name, "daily", [])  # Attempt to add another habit with the same name.
+    assert tracker.add_habit(habit_name, "daily", []) == "Added habit: Meditate (daily)"  # Add a habit.
+    response = tracker.add_habit(habit_name, "daily", [])  # Attempt to add another habit with the same name.
+    assert "already exists" in response  # Verify the response reports the rejection.
     assert len(tracker.habits) == 1  # Ensure no duplicate was added.
+
+def test_journal_replay_and_compaction(tmp_path):
+    """
+    Test that journaled mutations survive a restart, that a torn last record is ignored and that compaction empties the journal.
+    """
+    json_path = tmp_path / "journal_habits.json"
+    json_path.write_text("{}")
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    tracker = HabitTracker(str(json_path), journal=True)
+    tracker.add_habit("Walk", "daily", [])
+    tracker.update_habit_custom_date("Walk", yesterday)
+    assert json_path.read_text() == "{}"  # The snapshot is untouched until compaction.
+
+    with open(tracker.storage.journal.journal_path, 'a') as f:
+        f.write('{"op": "remove", "na')  # Simulate a crash in the middle of a write.
+    reloaded = HabitTracker(str(json_path), journal=True)
+    assert reloaded.habits["Walk"].completion_dates == [yesterday]
+
+    reloaded.compact()
+    assert reloaded.storage.journal.record_count == 0
+    assert HabitTracker(str(json_path)).habits["Walk"].completion_dates == [yesterday]
+
+def test_sqlite_backend_matches_json(tmp_path):
+    """
+    Test that the SQLite backend persists mutations and that migrated data gives the same analytics as the JSON file.
+    """
+    from habit_classes.migrate import migrate_json_to_sqlite
+
+    db_tracker = HabitTracker(str(tmp_path / "habits.db"))
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    db_tracker.add_habit("Stretch", "daily", [])
+    db_tracker.update_habit_custom_date("Stretch", yesterday)
+    db_tracker.remove_habit("Stretch")
+    db_tracker.add_habit("Swim", "weekly", [yesterday])
+    db_tracker.close()
+    assert HabitTracker(str(tmp_path / "habits.db")).habits["Swim"].completion_dates == [yesterday]
+    assert "Stretch" not in HabitTracker(str(tmp_path / "habits.db")).habits
+
+    db_path, count = migrate_json_to_sqlite("data/sample_habits.json", str(tmp_path / "sample.db"))
+    json_tracker = HabitTracker("data/sample_habits.json")
+    sqlite_tracker = HabitTracker(db_path)
+    assert count == len(json_tracker.habits)
+    assert sqlite_tracker.habits_most_struggled_last_month() == json_tracker.habits_most_struggled_last_month()
+
+def test_habit_keeps_completions_sorted_and_unique():
+    """
+    Test that completions are stored as sorted unique ordinals while still reading like a list of date strings.
+    """
+    from habit_classes.habit import Habit
+
+    habit = Habit("Journal", "daily", ["2024-03-03", "2024-03-01", "2024-03-03"])
+    assert habit.completion_dates == ["2024-03-01", "2024-03-03"]  # Duplicates are dropped and dates are sorted.
+    assert habit.add_completion("2024-03-02")  # A back-dated insert lands in the middle.
+    assert not habit.add_completion("2024-03-02")  # Adding the same day twice is refused.
+    assert list(habit.completion_dates) == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    assert "2024-03-02" in habit.completion_dates
+    assert "not a date" not in habit.completion_dates
+
+def reference_streak(habit_type, completion_dates, today):
+    """
+    The original full-history streak algorithm, kept here to verify the incremental streak state against it.
+    """
+    streak_counter = 0
+    date_check = today
+    sorted_dates = sorted(datetime.strptime(d, '%Y-%m-%d').date() for d in completion_dates)
+    if habit_type == 'daily':
+        for date in reversed(sorted_dates):
+            if date == date_check:
+                streak_counter += 1
+                date_check -= timedelta(days=1)
+            else:
+                break
+    elif habit_type == 'weekly' and sorted_dates:
+        current_week_start = today - timedelta(days=today.weekday())
+        for date in sorted_dates[::-1]:
+            week_start = date - timedelta(days=date.weekday())
+            if current_week_start == week_start:
+                streak_counter += 1
+                current_week_start -= timedelta(weeks=1)
+            elif week_start < current_week_start:
+                break
+    return streak_counter
+
+def reference_longest(habit_type, completion_dates):
+    """
+    The longest run of consecutive days or weeks, computed from scratch.
+    """
+    units = sorted({datetime.strptime(d, '%Y-%m-%d').date().toordinal() for d in completion_dates})
+    if habit_type == 'weekly':
+        units = sorted({(ordinal - 1) // 7 for ordinal in units})
+    longest = run = 0
+    for index, unit in enumerate(units):
+        run = run + 1 if index and unit == units[index - 1] + 1 else 1
+        longest = max(longest, run)
+    return longest
+
+@pytest.mark.parametrize("habit_type", ["daily", "weekly"])
+def test_incremental_streak_state_matches_full_scan(habit_type):
+    """
+    Test that the incrementally maintained streak state matches the full-history algorithm for random,
+    out-of-order completions and for reference dates around day and week boundaries.
+    """
+    import random
+    from habit_classes.habit import Habit
+
+    rng = random.Random(42 if habit_type == "daily" else 7)
+    start = datetime(2024, 1, 1).date()
+    for _ in range(25):
+        days = rng.sample(range(120), rng.randint(0, 90))
+        dates = [(start + timedelta(days=day)).strftime('%Y-%m-%d') for day in days]
+        habit = Habit("Random", habit_type, [])
+        for index, date_str in enumerate(dates):
+            habit.add_completion(date_str)
+            if index % 10 == 0:
+                assert habit.longest_streak() == reference_longest(habit_type, dates[:index + 1])
+        assert habit.longest_streak() == reference_longest(habit_type, dates)
+        for offset in range(0, 130, 4):
+            today = start + timedelta(days=offset)
+            assert habit.current_streak(today) == reference_streak(habit_type, dates, today)
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_bulk_analytics_match_tracker(use_numpy):
+    """
+    Test that the bulk analytics engine (vectorized or pure Python) agrees with the per-habit tracker methods.
+    """
+    if use_numpy:
+        pytest.importorskip("numpy")
+    import random
+    from habit_classes.analytics import HabitAnalytics
+    from habit_classes.habit import Habit
+
+    rng = random.Random(3)
+    today = datetime(2024, 3, 20).date()
+    habits = {}
+    for index in range(40):
+        habit_type = "weekly" if index % 3 == 0 else "daily"
+        days = rng.sample(range(-100, 3), rng.randint(0, 80))
+        habits[f"habit {index}"] = Habit(f"habit {index}", habit_type, [(today + timedelta(days=d)).strftime('%Y-%m-%d') for d in days])
+    habits["empty"] = Habit("empty", "daily", [])
+
+    engine = HabitAnalytics(habits, use_numpy=use_numpy)
+    assert engine.current_streaks(today) == {name: habit.current_streak(today) for name, habit in habits.items()}
+    assert engine.longest_streaks() == {name: habit.longest_streak() for name, habit in habits.items()}
+    february = engine.monthly_counts()[(2024, 2)]
+    assert february == {name: sum(d.startswith("2024-02") for d in habit.completion_dates) for name, habit in habits.items()}
+    assert engine.most_struggled(2024, 2) == HabitAnalytics(habits, use_numpy=False).most_struggled(2024, 2)
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_bulk_struggle_ranking_matches_tracker(tmp_path, use_numpy):
+    """
+    Test that the analytics engine ranks struggled habits like the tracker, leaving out habits of other types.
+    """
+    if use_numpy:
+        pytest.importorskip("numpy")
+    from habit_classes.analytics import HabitAnalytics
+    from habit_classes.habit import Habit
+
+    tracker = HabitTracker(str(tmp_path / "habits.json"))
+    tracker.add_habit("read", "daily", ["2024-02-01", "2024-02-02"])
+    tracker.add_habit("gym", "weekly", ["2024-02-05"])
+    # A type the tracker does not rank, e.g. from an older or hand-edited file
+    tracker.habits["yearly"] = Habit("yearly", "yearly", [])
+    engine = HabitAnalytics(tracker.habits, use_numpy=use_numpy)
+    assert "yearly" not in engine.struggle_scores(2024, 2)
+    assert engine.most_struggled(2024, 2) == tracker.habits_most_struggled(2024, 2) == ["read", "gym"]
+
+def test_deferred_writes_are_coalesced(tmp_path):
+    """
+    Test that with autosave disabled mutations only mark the tracker dirty until a single flush writes them all.
+    """
+    json_path = tmp_path / "deferred_habits.json"
+    json_path.write_text("{}")
+    tracker = HabitTracker(str(json_path), autosave=False)
+    tracker.add_habit("Cook", "daily", [])
+    tracker.update_habit_custom_date("Cook", "2024-01-02")
+    tracker.update_habit_custom_date("Cook", "2024-01-01")
+    assert tracker.dirty
+    assert json_path.read_text() == "{}"  # Nothing is written before the flush.
+
+    assert tracker.flush()
+    assert not tracker.dirty
+    assert not tracker.flush()  # A clean tracker does not touch the file again.
+    assert HabitTracker(str(json_path)).habits["Cook"].completion_dates == ["2024-01-01", "2024-01-02"]
+
+class FakeMaster:
+    """
+    Stands in for the Tk root window: records scheduled callbacks instead of running an event loop.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.destroyed = False
+
+    def after(self, delay, function):
+        self.jobs[len(self.jobs)] = function
+        return len(self.jobs) - 1
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def destroy(self):
+        self.destroyed = True
+
+def test_tracker_worker_delivers_results_and_errors():
+    """
+    Test that the worker runs operations in order off the main thread, hands their results to the callbacks on
+    the polling thread, re-raises worker errors there, and that closing the app destroys the window even then.
+    """
+    import threading
+    from types import SimpleNamespace
+    from habit_gui.habit_tracker_app import HabitTrackerApp
+    from habit_gui.tracker_worker import TrackerWorker
+
+    master = FakeMaster()
+    statuses = []
+    worker = TrackerWorker(master, lambda depth, latency: statuses.append(depth))
+    results = []
+    worker.submit(threading.get_ident, results.append)
+    worker.submit(lambda: "second", results.append)
+    assert statuses == [1, 2]
+    worker.shutdown()
+    assert results[0] != threading.get_ident() and results[1] == "second"
+    assert worker.queue_depth == 0 and statuses[-1] == 0
+
+    worker = TrackerWorker(master)
+    worker.submit(lambda: 1 / 0, results.append)
+    with pytest.raises(ZeroDivisionError):
+        worker.shutdown()
+    assert len(results) == 2
+
+    def failing_close():
+        raise OSError("disk full")
+
+    master = FakeMaster()
+    app = SimpleNamespace(master=master, worker=TrackerWorker(master), tracker=SimpleNamespace(close=failing_close),
+                          _save_job=None, _watch_job=None, save_changes=lambda: None)
+    with pytest.raises(OSError):
+        HabitTrackerApp.on_close(app)
+    assert master.destroyed
+
+def test_fill_missing_dates_reports_and_extends_streaks(tmp_path):
+    """
+    Test that backfilling only fills the gap after the last completion, reports the count per habit and keeps streaks up to date.
+    """
+    today = datetime(2024, 3, 20).date()
+    json_path = tmp_path / "backfill_habits.json"
+    json_path.write_text('{"Run": {"type": "daily", "completion_dates": ["2024-03-01", "2024-03-15"]},'
+                         ' "Clean": {"type": "weekly", "completion_dates": ["2024-03-04"]},'
+                         ' "Empty": {"type": "daily", "completion_dates": []}}')
+
+    results = HabitTracker.fill_missing_dates_in_files([str(json_path)], today)
+    assert results == {str(json_path): {"Run": 5, "Clean": 16}}
+    tracker = HabitTracker(str(json_path))
+    assert tracker.habits["Run"].completion_dates[-6:] == ["2024-03-15", "2024-03-16", "2024-03-17", "2024-03-18", "2024-03-19", "2024-03-20"]
+    assert tracker.habits["Run"].current_streak(today) == 6
+    assert tracker.habits["Clean"].current_streak(today) == 3
+    assert tracker.fill_missing_dates(today) == {}  # Nothing is left to fill.
+
+@pytest.mark.parametrize("file_name, journal", [("fill.json", False), ("fill.json", True), ("fill.db", False),
+                                                ("fill.hbt", False)])
+def test_filled_dates_are_persisted_by_every_backend(tmp_path, file_name, journal):
+    """
+    Test that backfilled dates are queued as mutations, so they survive a later write and an external change.
+    """
+    today = datetime(2024, 3, 20).date()
+    path = str(tmp_path / file_name)
+    tracker = HabitTracker(path, journal=journal)
+    tracker.add_habit("Run", "daily", ["2024-03-15"])
+    tracker.add_habit("Read", "daily", [])
+    assert tracker.fill_missing_dates(today) == {"Run": 5}
+    assert tracker.dirty
+    tracker.update_habit_custom_date("Read", "2024-03-19")
+    tracker.close()
+
+    reopened = HabitTracker(path, journal=journal)
+    assert reopened.habits["Run"].completion_dates[-1] == "2024-03-20"
+    assert len(reopened.habits["Run"].completion_dates) == 6
+    # Another process writing the file merges with the backfill instead of dropping it
+    assert reopened.fill_missing_dates(datetime(2024, 3, 22).date()) == {"Run": 2, "Read": 3}
+    other = HabitTracker(path, journal=journal)
+    other.add_habit("Walk", "weekly", [])
+    other.close()
+    changes = reopened.check_external_changes()
+    assert changes["added"] == ["Walk"] and not changes["changed"] and not changes["conflicts"]
+    reopened.close()
+    final = HabitTracker(path, journal=journal)
+    assert [final.habits[name].completion_dates[-1] for name in ("Run", "Read")] == ["2024-03-22", "2024-03-22"]
+    assert "Walk" in final.habits
+
+def test_benchmark_dataset_generator_is_seeded(tmp_path):
+    """
+    Test that the benchmark generator is deterministic and writes files HabitTracker can load.
+    """
+    from benchmarks.dataset_generator import generate_dataset, write_dataset
+
+    end = datetime(2024, 3, 20).date()
+    assert generate_dataset(20, 1, seed=5, end=end) == generate_dataset(20, 1, seed=5, end=end)
+    json_path = tmp_path / "generated_habits.json"
+    write_dataset(str(json_path), num_habits=20, years=1, weekly_ratio=0.5, seed=5, end=end)
+    tracker = HabitTracker(str(json_path))
+    assert len(tracker.habits) == 20
+    assert {habit.habit_type for habit in tracker.habits.values()} == {"daily", "weekly"}
+
+def test_instrumentation_records_operations(tracker, tmp_path, capsys):
+    """
+    Test that enabled metrics count operations, bytes and parsed dates, capture a requested profile and export to a file,
+    and that streak queries no longer print anything.
+    """
+    import json
+    from habit_classes.instrumentation import metrics
+
+    metrics.reset()
+    metrics.enable()
+    try:
+        tracker.add_habit("Paint", "daily", [])
+        tracker.update_habit_custom_date("Paint", "2024-01-01")
+        metrics.profile_next('longest_habit_streak', str(tmp_path / "longest.prof"))
+        tracker.longest_habit_streak()
+        metrics.export(str(tmp_path / "metrics.json"))
+    finally:
+        metrics.disable()
+        metrics.reset()
+
+    exported = json.loads((tmp_path / "metrics.json").read_text())
+    assert exported['operations']['update_habit_custom_date']['count'] == 1
+    assert exported['operations']['longest_habit_streak']['count'] == 1
+    assert exported['counters']['streak_cache_misses'] == 1
+    assert exported['counters']['snapshot_writes'] == 2
+    assert exported['counters']['bytes_written'] > 0
+    assert exported['counters']['dates_parsed'] >= 1
+    assert (tmp_path / "longest.prof").stat().st_size > 0
+    assert capsys.readouterr().out == ""
+
+def test_batch_api_persists_once(tracker, tmp_path, monkeypatch):
+    """
+    Test that a batch is validated item by item, returns the usual messages and is persisted with a single write,
+    and that CSV and JSON-lines files are imported as streams.
+    """
+    writes = []
+    original_apply = tracker.storage.apply
+    monkeypatch.setattr(tracker.storage, "apply", lambda records, habits: (writes.append(len(records)), original_apply(records, habits)))
+
+    messages = tracker.apply_batch([
+        {"op": "add", "name": "Yoga", "type": "daily"},
+        ("Yoga", "2024-01-01"),
+        ("Yoga", "2024-01-01"),
+        ("Yoga", "01/02/2024"),
+        ("Piano", "2024-01-01"),
+    ])
+    assert messages == ["Added habit: Yoga (daily)",
+                        "Habit 'Yoga' marked as completed on 2024-01-01.",
+                        "Habit 'Yoga' is already marked as completed on 2024-01-01.",
+                        "Invalid date format. Please use YYYY-MM-DD.",
+                        "Habit 'Piano' does not exist."]
+    assert writes == [2]
+
+    csv_path = tmp_path / "import.csv"
+    csv_path.write_text("habit,date\nYoga,2024-01-02\nYoga,2024-01-03\nPiano,2024-01-03\n")
+    jsonl_path = tmp_path / "import.jsonl"
+    jsonl_path.write_text('{"op": "add", "name": "Piano", "type": "weekly"}\n{"habit": "Piano", "date": "2024-01-03"}\n')
+    assert tracker.import_file(str(csv_path)) == {"applied": 2, "rejected": 1, "messages": ["Habit 'Piano' does not exist."]}
+    assert tracker.import_file(str(jsonl_path))["applied"] == 2
+    assert writes == [2, 2, 2]
+    assert HabitTracker(tracker.json_file_path).habits["Yoga"].completion_dates == ["2024-01-01", "2024-01-02", "2024-01-03"]
+
+@pytest.mark.parametrize("file_name", ["padded.json", "padded.db"])
+def test_unpadded_dates_are_stored_zero_padded(tmp_path, file_name):
+    """
+    Test that dates given without zero padding are accepted and persisted in the YYYY-MM-DD form, so the file can
+    be opened again.
+    """
+    path = str(tmp_path / file_name)
+    tracker = HabitTracker(path, journal=True)
+    tracker.add_habit("A", "daily", ["2024-1-4"])
+    assert tracker.update_habit_custom_date("A", "2024-1-5") == "Habit 'A' marked as completed on 2024-01-05."
+    tracker.close()
+    assert HabitTracker(path, journal=True).habits["A"].completion_dates == ["2024-01-04", "2024-01-05"]
+
+def test_batch_rejects_malformed_items_and_keeps_going(tracker, tmp_path):
+    """
+    Test that malformed additions and undecodable JSON-lines rows are rejected one by one instead of aborting the
+    batch, and that only the valid items are written.
+    """
+    future = (datetime.today() + timedelta(days=2)).strftime('%Y-%m-%d')
+    results = tracker.apply_batch([
+        {"op": "add", "name": "A"},
+        {"op": "add", "name": "B", "completion_dates": ["bad-date"]},
+        {"op": "add", "name": "C", "completion_dates": [future]},
+        {"op": "add", "name": "D", "type": "monthly"},
+        {"op": "add", "name": ""},
+        {"op": "add", "name": "E", "completion_dates": "2024-01-01"},
+        ("too", "many", "values"),
+        ("A", "2024-01-01"),
+    ], with_status=True)
+    assert [applied for _, applied in results] == [True, False, False, False, False, False, False, True]
+    assert results[1][0] == "Invalid date format. Please use YYYY-MM-DD."
+    assert sorted(HabitTracker(tracker.json_file_path).habits) == ["A"]
+
+    jsonl_path = tmp_path / "broken.jsonl"
+    jsonl_path.write_text('{"op": "add", "name": "F", "type": "weekly"}\n{not json\n{"habit": "F", "date": "2024-01-03"}\n')
+    summary = tracker.import_file(str(jsonl_path))
+    assert summary == {"applied": 2, "rejected": 1, "messages": ["Line 2: not a valid operation."]}
+    assert HabitTracker(tracker.json_file_path).habits["F"].completion_dates == ["2024-01-03"]
+
+def test_lazy_loading_parses_histories_on_demand(tmp_path):
+    """
+    Test that lazy mode starts from the sidecar index, lists habits without loading any dates, loads a history only
+    when it is touched and copies untouched histories as-is when saving.
+    """
+    import json
+
+    json_path = tmp_path / "lazy_habits.json"
+    data = {"Read": {"type": "daily", "completion_dates": ["2024-01-01", "2024-01-02"]},
+            "Gym": {"type": "weekly", "completion_dates": ["2024-01-03"]},
+            "New": {"type": "daily", "completion_dates": []}}
+    json_path.write_text(json.dumps(data, indent=4))
+
+    HabitTracker(str(json_path), lazy=True)  # The first lazy start builds the index.
+    tracker = HabitTracker(str(json_path), lazy=True)
+    assert not any(habit.is_loaded for habit in tracker.habits.values())
+    assert tracker.current_daily_habits() == ["Read", "New"]
+    assert tracker.current_weekly_habits() == ["Gym"]
+    assert not any(habit.is_loaded for habit in tracker.habits.values())
+
+    tracker.update_habit_custom_date("Read", "2024-01-03")
+    assert tracker.habits["Read"].is_loaded and tracker.habits["Read"].lazy_source is None
+    assert not tracker.habits["Gym"].is_loaded  # Saving copied Gym's dates without parsing them.
+    assert tracker.habits["Gym"].lazy_source.read_text() == '[\n            "2024-01-03"\n        ]'
+    data["Read"]["completion_dates"].append("2024-01-03")
+    assert json_path.read_text() == json.dumps(data, indent=4)
+    assert tracker.habits["Gym"].completion_dates == ["2024-01-03"]
+    assert HabitTracker(str(json_path), lazy=True).habits["Read"].completion_dates == data["Read"]["completion_dates"]
+
+def test_failed_atomic_write_keeps_the_old_file(tmp_path):
+    """
+    Test that a write failing half way leaves the previous file in place and no temporary file behind.
+    """
+    from habit_classes.persistence import atomic_write, atomic_write_json
+
+    path = tmp_path / "habits.json"
+    assert atomic_write_json(str(path), {"Read": {"type": "daily", "completion_dates": []}}) == path.stat().st_size
+
+    def failing_writer(f):
+        f.write(b'{"Read": ')
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        atomic_write(str(path), failing_writer, suffix='.json')
+    assert [entry.name for entry in tmp_path.iterdir()] == ["habits.json"]
+    assert HabitTracker(str(path)).habits["Read"].habit_type == "daily"
+
+def test_binary_snapshot_round_trip_and_checksum(tmp_path):
+    """
+    Test that JSON converts to the binary format and back unchanged, that the binary backend loads lazily and
+    persists changes, and that a corrupted snapshot is rejected.
+    """
+    import json
+    from habit_classes.binary_snapshot import BinarySnapshot
+    from habit_classes.migrate import binary_to_json, json_to_binary
+
+    json_path = tmp_path / "habits.json"
+    data = {"Read": {"type": "daily", "completion_dates": ["2024-01-01", "2024-01-02"]},
+            "Gym": {"type": "weekly", "completion_dates": ["2024-01-03"]},
+            "Ünïcode": {"type": "daily", "completion_dates": []}}
+    json_path.write_text(json.dumps(data, indent=4))
+    binary_path, count = json_to_binary(str(json_path))
+    assert count == 3 and binary_path.endswith(".hbt")
+    json_path.unlink()
+    binary_to_json(binary_path, str(json_path))
+    assert json.loads(json_path.read_text()) == data
+
+    tracker = HabitTracker(binary_path)
+    assert not any(habit.is_loaded for habit in tracker.habits.values())
+    assert tracker.current_weekly_habits() == ["Gym"]
+    tracker.update_habit_custom_date("Read", "2024-01-03")
+    tracker.close()
+    assert HabitTracker(binary_path).habits["Read"].completion_dates == ["2024-01-01", "2024-01-02", "2024-01-03"]
+
+    raw = bytearray(open(binary_path, "rb").read())
+    raw[-1] ^= 0xFF
+    open(binary_path, "wb").write(bytes(raw))
+    with pytest.raises(ValueError, match="Checksum"):
+        BinarySnapshot(binary_path)
+
+def test_rollups_drive_monthly_reports(tmp_path):
+    """
+    Test that the monthly and ISO week rollups follow insertions and backfills, give the struggle ranking, trends and
+    adherence of any month, and are persisted in the lazy index so reports do not load any history.
+    """
+    import json
+    from habit_classes.habit import Habit
+    from habit_classes.rollups import CompletionRollup, month_weeks
+
+    # February 2021 has exactly 4 ISO weeks (Monday 1st to Sunday 28th); April 2021 has 5 (Thursdays 1st to 29th)
+    assert len(month_weeks(2021, 2)) == 4 and len(month_weeks(2021, 4)) == 5
+    habit = Habit("Read", "daily", ["2021-01-30"])
+    assert habit.rollup.month_count(2021, 1) == 1
+    habit.add_completion("2021-01-10")
+    habit.backfill_until(datetime(2021, 3, 3).date().toordinal())
+    expected = CompletionRollup.from_ordinals(habit.ordinals)
+    assert habit.rollup.months == expected.months and habit.rollup.weeks == expected.weeks
+
+    json_path = tmp_path / "habits.json"
+    data = {"Read": {"type": "daily", "completion_dates": [f"2021-02-{day:02d}" for day in range(1, 29)]},
+            "Gym": {"type": "weekly", "completion_dates": ["2021-02-01", "2021-02-02", "2021-02-10"]},
+            "Walk": {"type": "daily", "completion_dates": ["2021-02-03"]}}
+    json_path.write_text(json.dumps(data, indent=4))
+    HabitTracker(str(json_path), lazy=True)  # The first lazy start builds the index with the rollups.
+    tracker = HabitTracker(str(json_path), lazy=True)
+    assert tracker.habits_most_struggled(2021, 2) == ["Walk", "Gym", "Read"]
+    assert tracker.monthly_adherence(2021, 2) == {"Read": 100.0, "Gym": 50.0, "Walk": 100.0 / 28}
+    trend = tracker.completion_trend("Gym", (2021, 2), (2021, 4))
+    assert [(row["month"], row["done"], row["possible"]) for row in trend] == [(2, 2, 4), (3, 0, 4), (4, 0, 5)]
+    assert not any(habit.is_loaded for habit in tracker.habits.values())
+
+    tracker.update_habit_custom_date("Walk", "2021-02-04")
+    assert HabitTracker(str(json_path), lazy=True).habits["Walk"].rollup.month_count(2021, 2) == 2
+
+def test_sqlite_month_counts_use_the_date_index(tmp_path):
+    """
+    Test that SQLite answers the monthly struggle and adherence reports with its indexed query, matching the
+    rollups, and that unwritten mutations fall back to the in-memory rollups.
+    """
+    import random
+    from habit_classes.rollups import habits_month_done
+
+    rng = random.Random(11)
+    start = datetime(2020, 12, 1).date()
+    tracker = HabitTracker(str(tmp_path / "habits.db"))
+    for index in range(6):
+        days = rng.sample(range(200), rng.randint(0, 120))
+        tracker.add_habit(f"Habit {index}", "weekly" if index % 2 else "daily",
+                          [(start + timedelta(days=day)).strftime('%Y-%m-%d') for day in days])
+    habits = HabitTracker(str(tmp_path / "habits.db")).habits
+    for year, month in [(2020, 12), (2021, 1), (2021, 3), (2021, 5), (2021, 6)]:
+        expected = habits_month_done(habits, year, month)
+        assert tracker.storage.month_done(habits, year, month) == expected
+    reopened = HabitTracker(str(tmp_path / "habits.db"), autosave=False)
+    ranking = reopened.habits_most_struggled(2021, 3, top=6)
+    assert all(habit._rollup is None for habit in reopened.habits.values())  # No rollup was built.
+    assert ranking == tracker.habits_most_struggled(2021, 3, top=6)
+
+    reopened.add_habit("Late", "daily", [])
+    assert reopened.monthly_adherence(2021, 3)["Late"] == 0.0  # Pending, so counted from the rollups.
+
+def test_tracker_manager_shards_profiles_and_evicts_lru(tmp_path):
+    """
+    Test that the tracker manager stores each profile in a sharded file, keeps at most max_open trackers loaded,
+    writes evicted trackers back and serializes concurrent calls on the same profile.
+    """
+    import threading
+    from habit_classes.tracker_manager import TrackerManager
+
+    manager = TrackerManager(str(tmp_path), max_open=2)
+    path = manager.profile_path("a/b")
+    assert path.startswith(str(tmp_path)) and path.endswith("a%2Fb.json")
+    for profile in ("alice", "bob", "carol"):
+        with manager.tracker(profile) as tracker:
+            tracker.add_habit("Read", "daily", [])
+            assert tracker.dirty
+    assert manager.open_profiles == ["bob", "carol"]
+    assert "Read" in HabitTracker(manager.profile_path("alice")).habits  # Written back on eviction.
+
+    def complete(day):
+        with manager.tracker("bob") as tracker:
+            tracker.update_habit_custom_date("Read", f"2024-01-{day:02d}")
+
+    threads = [threading.Thread(target=complete, args=(day,)) for day in range(1, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.close()
+    assert manager.open_profiles == []
+    assert len(HabitTracker(manager.profile_path("bob")).habits["Read"].completion_dates) == 20
+
+def test_tracker_manager_keeps_trackers_it_cannot_write(tmp_path):
+    """
+    Test that a failed write-back on eviction keeps the evicted tracker and its mutations, and is not raised to the
+    caller using another profile.
+    """
+    from habit_classes.tracker_manager import TrackerManager
+
+    manager = TrackerManager(str(tmp_path), max_open=1)
+    with manager.tracker("alice") as alice:
+        alice.add_habit("Read", "daily", [])
+
+    def full_disk(records, habits):
+        raise OSError("No space left on device")
+
+    alice.storage.apply = full_disk
+    with manager.tracker("bob") as bob:
+        bob.add_habit("Gym", "weekly", [])
+    # Bob's tracker is evicted instead, and alice's stays loaded with its unwritten habit
+    assert manager.open_profiles == ["alice"]
+    assert alice.dirty and "Read" in alice.habits
+    assert "Gym" in HabitTracker(manager.profile_path("bob")).habits
+
+    del alice.storage.apply
+    with manager.tracker("carol"):
+        pass
+    assert manager.open_profiles == ["carol"]
+    assert "Read" in HabitTracker(manager.profile_path("alice")).habits
+    manager.close()
+
+def test_http_server_coalesces_completions(tmp_path):
+    """
+    Test the HTTP/JSON API end to end with the bundled load generator: concurrent completions are persisted with
+    fewer writes than requests, and errors map to HTTP statuses.
+    """
+    import asyncio
+    from habit_server.loadgen import Connection, run_load
+    from habit_server.server import HabitServer
+
+    json_path = str(tmp_path / "served_habits.json")
+    server = HabitServer(HabitTracker(json_path))
+
+    async def scenario():
+        bound = asyncio.get_running_loop().create_future()
+        serving = asyncio.ensure_future(server.serve('127.0.0.1', 0, bound.set_result))
+        host, port = await bound
+        report = await run_load(host, port, connections=10, requests=200, habits=2, complete_ratio=1.0)
+        connection = await Connection.open(host, port)
+        missing = await connection.request('POST', '/habits/nope/completions', {'date': '2024-01-01'})
+        invalid = await connection.request('POST', '/habits/load%200/completions', {'date': 'yesterday'})
+        listed = await connection.request('GET', '/habits')
+        connection.close()
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        return report, missing, invalid, listed
+
+    report, missing, invalid, listed = asyncio.run(scenario())
+    assert report["requests"] == 200 and report["p50_ms"] <= report["p99_ms"]
+    assert missing[0] == 404 and invalid[0] == 400
+    assert sorted(listed[1]) == ["load 0", "load 1"]
+    assert server.batches_written < 200  # Concurrent completions were grouped into fewer writes.
+    stored = HabitTracker(json_path).habits
+    assert sum(len(habit.completion_dates) for habit in stored.values()) == report["statuses"].get(200, 0)
+
+def test_http_server_answers_unexpected_errors_with_500(tmp_path, monkeypatch):
+    """
+    Test that an unexpected error while handling a request, such as a failing save, is answered with a 500 JSON
+    response and the connection keeps serving.
+    """
+    import asyncio
+    from habit_server.loadgen import Connection
+    from habit_server.server import HabitServer
+
+    tracker = HabitTracker(str(tmp_path / "served_habits.json"))
+    server = HabitServer(tracker)
+
+    def failing_apply(records, habits):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(tracker.storage, "apply", failing_apply)
+
+    async def scenario():
+        bound = asyncio.get_running_loop().create_future()
+        serving = asyncio.ensure_future(server.serve('127.0.0.1', 0, bound.set_result))
+        host, port = await bound
+        connection = await Connection.open(host, port)
+        added = await connection.request('POST', '/habits', {'name': 'Read', 'type': 'daily'})
+        completed = await connection.request('POST', '/habits/Read/completions', {'date': '2024-01-01'})
+        listed = await connection.request('GET', '/habits')
+        connection.close()
+        monkeypatch.undo()  # Let the server write its pending changes on shutdown.
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        return added, completed, listed
+
+    added, completed, listed = asyncio.run(scenario())
+    assert added == (500, {"message": "Internal server error."})
+    assert completed[0] == 500
+    assert listed[0] == 200 and "Read" in listed[1]
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_http_server_rejects_invalid_content_length(tmp_path, length):
+    """
+    Test that a request with a non-integer or negative Content-Length is answered with 400 before closing.
+    """
+    import asyncio
+    import json
+    from habit_server.server import HabitServer
+
+    server = HabitServer(HabitTracker(str(tmp_path / "served_habits.json")))
+
+    async def scenario():
+        bound = asyncio.get_running_loop().create_future()
+        serving = asyncio.ensure_future(server.serve('127.0.0.1', 0, bound.set_result))
+        host, port = await bound
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"POST /habits HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode('latin-1'))
+        response = await reader.read()  # Until the server closes the connection
+        writer.close()
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        return response
+
+    head, _, body = asyncio.run(scenario()).partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 400 ')
+    assert json.loads(body) == {"message": "Invalid Content-Length header."}
+
+def test_multi_file_analytics_merges_worker_summaries(tmp_path):
+    """
+    Test that the process pool analytics give the same report as a serial run, match the per-file tracker methods
+    and report unreadable files instead of failing.
+    """
+    from benchmarks.dataset_generator import write_dataset
+    from habit_classes.multi_file_analytics import analyze_files
+
+    today = datetime(2024, 3, 20).date()
+    for index in range(4):
+        shard = tmp_path / f"shard{index % 2}"
+        shard.mkdir(exist_ok=True)
+        write_dataset(str(shard / f"user{index}.json"), num_habits=15, years=1, seed=index, end=today)
+    (tmp_path / "broken.json").write_text("{not json")
+
+    serial = analyze_files([str(tmp_path)], workers=1, top=5, today=today)
+    parallel = analyze_files([str(tmp_path)], workers=2, chunksize=2, top=5, today=today)
+    assert parallel == serial
+    assert serial["files"] == 5 and serial["habits"] == 60 and len(serial["errors"]) == 1
+    trackers = [HabitTracker(str(path)) for path in sorted(tmp_path.glob("shard*/*.json"))]
+    streaks = sorted((habit.verify_streak(today) for tracker in trackers for habit in tracker.habits.values()), reverse=True)
+    assert [entry["streak"] for entry in serial["leaderboard"]] == streaks[:5]
+    assert sum(sum(counts.values()) for counts in serial["streak_distribution"].values()) == 60
+    struggled = sum(len(tracker.habits_most_struggled(2024, 2)) for tracker in trackers)
+    assert sum(entry["files"] for entry in serial["most_struggled"]) <= struggled
+
+def test_multi_file_analytics_reports_malformed_files(tmp_path):
+    """
+    Test that readable but structurally malformed habit files are reported one by one instead of aborting the run.
+    """
+    import json
+    from habit_classes.multi_file_analytics import analyze_files
+
+    (tmp_path / "good.json").write_text(json.dumps({"Read": {"type": "daily", "completion_dates": ["2024-03-19"]}}))
+    (tmp_path / "no_type.json").write_text(json.dumps({"Read": {"completion_dates": []}}))
+    (tmp_path / "bad_dates.json").write_text(json.dumps({"Read": {"type": "daily", "completion_dates": 5}}))
+    (tmp_path / "not_a_dict.json").write_text(json.dumps(["Read"]))
+
+    report = analyze_files([str(tmp_path)], workers=1, today=datetime(2024, 3, 20).date())
+    assert report["files"] == 4 and report["habits"] == 1
+    assert sorted(error["path"].rsplit("/", 1)[-1] for error in report["errors"]) == ["bad_dates.json", "no_type.json",
+                                                                                    "not_a_dict.json"]
+
+def reference_completion_index(habits):
+    """Build the day -> habit names mapping by brute force, for comparison with the incremental index."""
+    from datetime import date
+
+    result = {}
+    for name, habit in habits.items():
+        for date_str in habit.completion_dates:
+            result.setdefault(date.fromisoformat(date_str).toordinal(), set()).add(name)
+    return result
+
+def test_date_range_queries_follow_mutations(tracker):
+    """
+    Test the date-range query layer: range, per-day, empty-day and heatmap queries, completion rates, and that the
+    inverted index follows additions, completions, backfills and removals.
+    """
+    from datetime import date
+
+    tracker.add_habit("Read", "daily", ["2024-07-01", "2024-07-02"])
+    tracker.add_habit("Gym", "weekly", ["2024-07-02", "2024-07-03"])
+    assert tracker.completions_on(date(2024, 7, 2)) == ["Gym", "Read"]
+
+    tracker.add_habit("Walk", "daily", ["2024-07-05"])
+    tracker.update_habit_custom_date("Read", "2024-07-04")
+    assert tracker.habits_completed_between(date(2024, 7, 4), date(2024, 7, 6)) == ["Read", "Walk"]
+    assert tracker.empty_days(date(2024, 6, 30), date(2024, 7, 6)) == [date(2024, 6, 30), date(2024, 7, 6)]
+    assert tracker.completion_heatmap(date(2024, 7, 1), date(2024, 7, 3)) == {
+        date(2024, 7, 1): 1, date(2024, 7, 2): 2, date(2024, 7, 3): 1}
+
+    tracker.remove_habit("Gym")
+    assert tracker.completions_on(date(2024, 7, 3)) == []
+    tracker.fill_missing_dates(today=date(2024, 7, 8))
+    assert tracker.completions_on(date(2024, 7, 8)) == ["Read", "Walk"]
+    assert tracker.completion_index()._habits_by_day == reference_completion_index(tracker.habits)
+
+    assert tracker.completion_rate("Walk", date(2024, 7, 1), date(2024, 7, 8)) == 50.0
+    tracker.add_habit("Swim", "weekly", ["2024-07-01", "2024-07-03", "2024-07-15"])
+    assert tracker.completion_rate("Swim", date(2024, 7, 1), date(2024, 7, 21)) == 200.0 / 3
+    # Days merged into and dropped from the middle of the sorted days keep it in sync with the mapping
+    assert list(tracker.completion_index()._days) == sorted(reference_completion_index(tracker.habits))
+    tracker.remove_habit("Read")
+    assert list(tracker.completion_index()._days) == sorted(reference_completion_index(tracker.habits))
+    assert tracker.completion_rate("Nope", date(2024, 7, 1), date(2024, 7, 21)) is None
+
+@pytest.mark.parametrize("file_name", ["shared.json", "shared.db", "shared.hbt"])
+def test_external_changes_are_merged_per_habit(tmp_path, file_name):
+    """
+    Test that a tracker notices another process writing its file, merges only the habits that changed, and
+    resolves habits also changed locally with the conflict policy.
+    """
+    path = str(tmp_path / file_name)
+    other = HabitTracker(path)
+    other.add_habit("Read", "daily", ["2024-01-01"])
+    other.add_habit("Walk", "daily", ["2024-01-01"])
+    local = HabitTracker(path, autosave=False)
+    walk = local.habits["Walk"]
+    assert local.check_external_changes() is None
+
+    other.update_habit_custom_date("Read", "2024-01-02")
+    other.add_habit("Gym", "weekly", [])
+    changes = local.check_external_changes()
+    assert changes == {"added": ["Gym"], "removed": [], "changed": ["Read"], "conflicts": []}
+    assert local.habits["Walk"] is walk  # Unchanged habits keep their objects.
+    assert local.habits["Read"].completion_dates == ["2024-01-01", "2024-01-02"]
+
+    local.update_habit_custom_date("Read", "2024-01-03")
+    local.update_habit_custom_date("Walk", "2024-01-05")
+    other.update_habit_custom_date("Read", "2024-01-04")
+    other.remove_habit("Gym")
+    local.flush()  # Merges the external changes before writing.
+    stored = HabitTracker(path).habits
+    assert sorted(stored) == ["Read", "Walk"]
+    assert stored["Read"].completion_dates == ["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-04"]
+    assert stored["Walk"].completion_dates == ["2024-01-01", "2024-01-05"]
+
+    local.update_habit_custom_date("Walk", "2024-01-06")
+    other.remove_habit("Walk")
+    assert local.check_external_changes("external")["conflicts"] == ["Walk"]
+    assert "Walk" not in local.habits and not local.dirty
+
+@pytest.mark.parametrize("options", [{"lazy": True}, {"lazy": True, "journal": True}])
+def test_external_changes_reload_only_changed_habits(tmp_path, monkeypatch, options):
+    """
+    Test that a lazy tracker picks up an external change from the per-habit checksums: only the changed habit is
+    replaced and reported, and unchanged habits keep their objects, stay unloaded and read from the new snapshot.
+    """
+    from habit_classes.persistence import SnapshotVersion
+
+    path = str(tmp_path / "lazy.json")
+    writer = HabitTracker(path, **options)
+    for index in range(5):
+        writer.add_habit(f"Habit {index}", "daily", [f"2024-01-0{day}" for day in range(1, index + 2)])
+    writer.compact()
+    local = HabitTracker(path, **options)
+    before = dict(local.habits)
+
+    writer.update_habit_custom_date("Habit 2", "2024-02-01")
+    writer.compact()  # Rewrites the snapshot, moving every habit's byte span.
+    writer.update_habit_custom_date("Habit 3", "2024-02-02")
+    monkeypatch.setattr(SnapshotVersion, "current_dates", lambda self, name: pytest.fail("full re-parse"))
+    changes = local.check_external_changes()
+    assert changes == {"added": [], "removed": [], "changed": ["Habit 2", "Habit 3"], "conflicts": []}
+    assert local.habits["Habit 2"] is not before["Habit 2"]
+    for name in ["Habit 0", "Habit 1", "Habit 4"]:
+        assert local.habits[name] is before[name] and not local.habits[name].is_loaded
+    assert local.habits["Habit 4"].completion_dates == [f"2024-01-0{day}" for day in range(1, 6)]
+    assert local.habits["Habit 3"].completion_dates[-1] == "2024-02-02"
+    assert local.check_external_changes() is None
+
+@pytest.mark.parametrize("habit_type", ["daily", "weekly"])
+def test_streak_cache_answers_past_dates_and_invalidates(tracker, habit_type):
+    """
+    Test that the streak cache matches the full-history algorithm on past dates, serves repeated queries from
+    memory, and recomputes after a mutation, a replaced habit or a day rollover.
+    """
+    import random
+    from habit_classes.habit import Habit
+    from habit_classes.streak_cache import StreakCache
+
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1).date()
+    dates = sorted((start + timedelta(days=day)).strftime('%Y-%m-%d') for day in rng.sample(range(150), 100))
+    tracker.add_habit("Run", habit_type, dates)
+    habit = tracker.habits["Run"]
+    cache = tracker.streak_cache
+    for offset in range(0, 160, 3):
+        day = start + timedelta(days=offset)
+        past = [d for d in dates if d <= day.strftime('%Y-%m-%d')] if habit_type == "daily" else dates
+        assert tracker.streak_as_of("Run", day) == reference_streak(habit_type, past, day)
+    history = tracker.streak_history("Run")
+    assert history["longest"] == habit.longest_streak() == max(length for _, _, length in history["segments"])
+    assert sum(length for _, _, length in history["segments"]) == len({habit.unit_of(o) for o in habit.ordinals})
+
+    today = start + timedelta(days=149)
+    misses = cache.misses
+    assert cache.current(habit, today) == cache.current(habit, today) == habit.current_streak(today)
+    assert cache.misses == misses  # Served from the cached entry.
+    assert cache.current(habit, today + timedelta(days=14)) == 0  # The day rolled over without completions.
+    tracker.update_habit_custom_date("Run", (today + timedelta(days=14)).strftime('%Y-%m-%d'))
+    assert cache.current(habit, today + timedelta(days=14)) == 1
+    assert cache.misses == misses + 1  # The mutation invalidated the entry.
+    assert cache._entries["Run"].segments is None  # The current streak never walks the history.
+    assert tracker.streak_as_of("Nope") is None and tracker.streak_history("Nope") is None
+
+    small = StreakCache(max_habits=1)
+    small.current(habit)
+    small.current(Habit("Other", habit_type, []))
+    assert len(small) == 1